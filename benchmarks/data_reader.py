@@ -0,0 +1,77 @@
+"""
+Measures DataReader and Importer.get_lookup_data throughput on a wide dataset.
+
+Usage: python -m benchmarks.data_reader [--rows N] [--columns N]
+"""
+
+import argparse
+import os
+import time
+
+import django
+
+
+def build_serializer(columns):
+    from rest_framework import serializers
+
+    attrs = {
+        "column_{0}".format(i): serializers.CharField(required=False)
+        for i in range(columns)
+    }
+    return type("WideSerializer", (serializers.Serializer,), attrs)
+
+
+def build_dataset(rows, columns):
+    from tablib import Dataset
+
+    headers = ["column_{0}".format(i) for i in range(columns)]
+    # A few columns that are not known to the serializer
+    headers += ["extra_{0}".format(i) for i in range(5)]
+    dataset = Dataset(headers=headers)
+    for row in range(rows):
+        dataset.append(
+            [" value {0}-{1} ".format(row, i) for i in range(columns)]
+            + [float(i) for i in range(5)]
+        )
+    return dataset
+
+
+def run(rows, columns):
+    from multi_import.importer import Importer
+
+    class WideImporter(Importer):
+        serializer_class = build_serializer(columns)
+
+    importer = WideImporter()
+    dataset = build_dataset(rows, columns)
+
+    start = time.perf_counter()
+    result = list(importer.read_rows(dataset))
+    for row, _data in result:
+        importer.get_lookup_data(row)
+    elapsed = time.perf_counter() - start
+
+    assert len(result) == rows
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--columns", type=int, default=150)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+    django.setup()
+
+    best = min(run(args.rows, args.columns) for _ in range(args.repeat))
+    print(
+        "read_rows + get_lookup_data: {0} rows x {1} columns in {2:.3f}s ({3:.0f} rows/sec)".format(
+            args.rows, args.columns, best, args.rows / best
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Measures importing and exporting a generated library of people and books
+in every file format.
+
+Prints one JSON object per scenario with its rows/sec, query count and
+peak traced memory, so results can be compared between releases.
+
+Usage: python -m benchmarks.import_export [--rows N [N ...]] [--formats F [F ...]]
+                                          [--scenarios S [S ...]] [--repeat N]
+                                          [--no-memory] [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+import django
+
+from benchmarks import library
+
+scenarios = ("import_data", "import_files", "export", "multi_export")
+
+
+def get_content_type(file_format, mimetypes):
+    for content_type in file_format.content_types:
+        if content_type in mimetypes:
+            return content_type
+    return "application/octet-stream"
+
+
+def build_files(file_format, datasets, mimetypes):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    content_type = get_content_type(file_format, mimetypes)
+    contents = {}
+    for name, dataset in datasets:
+        filename = "{0}.{1}".format(name, file_format.extension)
+        contents[filename] = file_format.write(dataset).getvalue()
+
+    # Uploaded files are read once, so a new set is built for each run
+    def get_files():
+        return {
+            filename: SimpleUploadedFile(filename, content, content_type)
+            for filename, content in contents.items()
+        }
+
+    return get_files
+
+
+def build_scenarios(rows, lib, formats, selected):
+    """
+    Yields the description, row count and function of each scenario.
+    """
+    from multi_import.data import ExportMode
+
+    person_importer, book_importer, multi_importer = library.build_importers()
+    people = lib.get_people()
+    books = lib.get_books()
+
+    if "import_data" in selected:
+        for name, importer, dataset in (
+            ("person", person_importer, people),
+            ("book", book_importer, books),
+        ):
+            yield (
+                {"scenario": "import_data", "importer": name},
+                rows,
+                # Imports are rolled back so every run starts from the same data
+                lambda importer=importer, dataset=dataset: importer().import_data(
+                    dataset, commit=False
+                ),
+            )
+
+    if "import_files" in selected:
+        for file_format in formats:
+            if not file_format.content_types:
+                continue
+            description = {"scenario": "import_files", "format": file_format.key}
+            try:
+                get_files = build_files(
+                    file_format,
+                    (("people", people), ("books", books)),
+                    multi_importer.mimetypes,
+                )
+            except Exception as e:
+                yield description, rows * 2, e
+                continue
+            yield (
+                description,
+                rows * 2,
+                lambda get_files=get_files: multi_importer().import_files(
+                    get_files(), commit=False
+                ),
+            )
+
+    if "export" in selected:
+        for file_format in formats:
+            yield (
+                {"scenario": "export", "importer": "book", "format": file_format.key},
+                rows,
+                lambda file_format=file_format: book_importer()
+                .export()
+                .get_file(file_format),
+            )
+
+    if "multi_export" in selected:
+        for file_format in formats:
+            for mode in (ExportMode.GROUPED, ExportMode.ITEMIZED):
+                yield (
+                    {
+                        "scenario": "multi_export",
+                        "format": file_format.key,
+                        "mode": mode,
+                    },
+                    rows * 2,
+                    lambda file_format=file_format, mode=mode: multi_importer()
+                    .export()
+                    .get_file(file_format, mode),
+                )
+
+
+def measure(function, trace_memory):
+    from multi_import.metrics import QueryCounter
+
+    counter = QueryCounter()
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        with counter.install():
+            result = function()
+        elapsed = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        tracemalloc.stop()
+    return elapsed, counter.count, peak_memory, result
+
+
+def run(function, rows, repeat, trace_memory):
+    timings = [measure(function, False) for _ in range(repeat)]
+    elapsed, queries, _peak_memory, result = min(timings, key=lambda t: t[0])
+
+    # Tracing slows everything down, so memory is measured in a separate run
+    peak_memory = measure(function, True)[2] if trace_memory else None
+
+    return {
+        "rows": rows,
+        "time": elapsed,
+        "rows_per_second": rows / elapsed if elapsed else None,
+        "queries": queries,
+        "peak_memory": peak_memory,
+        # Imports with errors would measure validation failures instead
+        "valid": getattr(result, "valid", True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000])
+    parser.add_argument("--formats", nargs="+")
+    parser.add_argument("--scenarios", nargs="+", choices=scenarios)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true")
+    parser.add_argument("--output", type=argparse.FileType("w"), default=sys.stdout)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+    django.setup()
+    library.create_database()
+
+    from multi_import.formats import all_formats
+
+    formats = [
+        file_format
+        for file_format in all_formats
+        if not args.formats or file_format.key in args.formats
+    ]
+
+    for rows in args.rows:
+        lib = library.Library(rows, seed=args.seed)
+        lib.populate()
+
+        for description, scenario_rows, function in build_scenarios(
+            rows, lib, formats, args.scenarios or scenarios
+        ):
+            if isinstance(function, Exception):
+                result = {"rows": scenario_rows, "error": repr(function)}
+            else:
+                try:
+                    result = run(
+                        function, scenario_rows, args.repeat, not args.no_memory
+                    )
+                except Exception as e:
+                    # Some formats can not hold every size, e.g. xls is limited
+                    # to 65536 rows
+                    result = {"rows": scenario_rows, "error": repr(e)}
+
+            args.output.write(json.dumps(dict(description, **result)) + "\n")
+            args.output.flush()
+
+
+if __name__ == "__main__":
+    main()
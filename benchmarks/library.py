@@ -0,0 +1,188 @@
+"""
+A deterministic library of people, books and chapters built on the
+tests.models schema, shared by the import and export benchmarks.
+
+Requires Django to be set up with tests.settings before use.
+"""
+
+import random
+
+from tablib import Dataset
+
+NEW = "new"
+UPDATED = "updated"
+UNCHANGED = "unchanged"
+
+chapter_count = 50
+max_book_chapters = 3
+
+person_headers = ["id", "first_name", "last_name"]
+book_headers = ["id", "name", "author", "chapters"]
+
+
+def create_database():
+    from django.core.management import call_command
+
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+def build_importers():
+    """
+    Returns the person and book importers, and a multi importer of both.
+    Files are identified by their first_name and name columns.
+    """
+    from rest_framework import serializers
+
+    from multi_import.fields import LookupRelatedField
+    from multi_import.importer import Importer
+    from multi_import.multi_importer import MultiImporter
+    from tests.models import Book, Chapter, Person
+
+    class PersonSerializer(serializers.ModelSerializer):
+        class Meta:
+            model = Person
+            fields = ("id", "first_name", "last_name")
+
+    class BookSerializer(serializers.ModelSerializer):
+        author = LookupRelatedField(
+            lookup_fields=("first_name",), queryset=Person.objects.all()
+        )
+        chapters = LookupRelatedField(
+            many=True, lookup_fields=("name",), queryset=Chapter.objects.all()
+        )
+
+        class Meta:
+            model = Book
+            fields = ("id", "name", "author", "chapters")
+
+    class PersonImporter(Importer):
+        key = "person"
+        model = Person
+        id_column = "first_name"
+        lookup_fields = ("id",)
+        serializer_class = PersonSerializer
+
+    class BookImporter(Importer):
+        key = "book"
+        model = Book
+        id_column = "name"
+        lookup_fields = ("id",)
+        serializer_class = BookSerializer
+
+    class LibraryMultiImporter(MultiImporter):
+        importers = [BookImporter, PersonImporter]
+
+    return PersonImporter, BookImporter, LibraryMultiImporter
+
+
+class Library(object):
+    """
+    Generates a library of the given number of people and books, and
+    datasets of the same size that mix new, updated and unchanged rows.
+    The same seed always produces the same rows.
+    """
+
+    # Share of new, updated and unchanged rows in the datasets
+    mix = ((NEW, 1), (UPDATED, 1), (UNCHANGED, 2))
+
+    def __init__(self, rows, seed=0):
+        self.rows = rows
+        self.seed = seed
+
+    def get_chapter_names(self, rng):
+        chapters = rng.sample(range(chapter_count), rng.randint(0, max_book_chapters))
+        return ["Chapter {0}".format(chapter) for chapter in sorted(chapters)]
+
+    def get_kinds(self, rng):
+        kinds, weights = zip(*self.mix)
+        return rng.choices(kinds, weights, k=self.rows)
+
+    def populate(self):
+        """
+        Replaces the contents of the database with the existing library.
+        """
+        from tests.models import Book, Chapter, Person
+
+        rng = random.Random(self.seed)
+
+        Book.objects.all().delete()
+        Person.objects.all().delete()
+        Chapter.objects.all().delete()
+
+        chapters = Chapter.objects.bulk_create(
+            Chapter(id=index + 1, name="Chapter {0}".format(index), text="Text")
+            for index in range(chapter_count)
+        )
+        chapter_ids = {chapter.name: chapter.id for chapter in chapters}
+
+        Person.objects.bulk_create(
+            Person(
+                id=index + 1,
+                first_name="Person {0}".format(index),
+                last_name="Last {0}".format(index),
+            )
+            for index in range(self.rows)
+        )
+
+        books = []
+        book_chapters = []
+        for index in range(self.rows):
+            books.append(
+                Book(
+                    id=index + 1,
+                    name="Book {0}".format(index),
+                    author_id=rng.randrange(self.rows) + 1,
+                )
+            )
+            for name in self.get_chapter_names(rng):
+                book_chapters.append(
+                    Book.chapters.through(
+                        book_id=index + 1, chapter_id=chapter_ids[name]
+                    )
+                )
+        Book.objects.bulk_create(books)
+        Book.chapters.through.objects.bulk_create(book_chapters)
+
+    def get_people(self):
+        rng = random.Random(self.seed + 1)
+        dataset = Dataset(headers=person_headers)
+        for index, kind in enumerate(self.get_kinds(rng)):
+            if kind == NEW:
+                row = ["", "New person {0}".format(index), "New"]
+            elif kind == UPDATED:
+                row = [index + 1, "Person {0}".format(index), "Updated"]
+            else:
+                row = [index + 1, "Person {0}".format(index), "Last {0}".format(index)]
+            dataset.append(row)
+        return dataset
+
+    def get_books(self):
+        """
+        Returns books whose authors and chapters are looked up by name.
+        Unchanged rows are read from the database, so populate() must have
+        been called first.
+        """
+        from tests.models import Book
+
+        existing = {
+            book.id: (book.author.first_name, [c.name for c in book.chapters.all()])
+            for book in Book.objects.select_related("author").prefetch_related(
+                "chapters"
+            )
+        }
+
+        rng = random.Random(self.seed + 2)
+        dataset = Dataset(headers=book_headers)
+        for index, kind in enumerate(self.get_kinds(rng)):
+            author = "Person {0}".format(rng.randrange(self.rows))
+            chapters = self.get_chapter_names(rng)
+            if kind == NEW:
+                row = ["", "New book {0}".format(index), author, chapters]
+            elif kind == UPDATED:
+                row = [index + 1, "Book {0}".format(index), author, chapters]
+            else:
+                author, chapters = existing[index + 1]
+                row = [index + 1, "Book {0}".format(index), author, chapters]
+            row[3] = ";".join(row[3])
+            dataset.append(row)
+        return dataset
@@ -0,0 +1,223 @@
+"""
+Profiles the memory used by imports and exports of a generated library of
+people and books with tracemalloc.
+
+Memory is snapshotted at the boundary of each import phase, reporting the
+bytes allocated and the top allocating lines of each phase, the peak and
+retained bytes per row, and the files holding the retained memory.
+
+Exits with status 1 when a scenario uses more bytes per row than allowed.
+
+Usage: python -m benchmarks.memory [--rows N] [--top N] [--scenarios S [S ...]]
+                                   [--max-peak-bytes-per-row N]
+                                   [--max-retained-bytes-per-row N]
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import tracemalloc
+from contextlib import contextmanager
+
+import django
+
+from benchmarks import library
+
+scenarios = ("import_person", "import_book", "multi_import", "export")
+
+ignored_files = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<unknown>"),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+def get_site(stat):
+    frame = stat.traceback[0]
+    return "{0}:{1}".format(shorten_path(frame.filename), frame.lineno)
+
+
+def shorten_path(filename):
+    for path in sorted(sys.path, key=len, reverse=True):
+        if path and filename.startswith(path + os.sep):
+            return os.path.relpath(filename, path)
+    return filename
+
+
+class MemoryProfile(object):
+    """
+    Snapshots traced memory at the start and end of each phase.
+    """
+
+    def __init__(self, top=10):
+        self.top = top
+        self.phases = []
+        self.peak = 0
+        self.baseline = None
+        self.snapshot = None
+
+    def take_snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces(ignored_files)
+
+    def update_peak(self):
+        current, peak = tracemalloc.get_traced_memory()
+        self.peak = max(self.peak, peak - self.baseline)
+        return current
+
+    def start(self):
+        gc.collect()
+        tracemalloc.start()
+        self.snapshot = self.baseline_snapshot = self.take_snapshot()
+        self.baseline = tracemalloc.get_traced_memory()[0]
+
+    @contextmanager
+    def phase(self, key, name, step=None):
+        self.update_peak()
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            after = self.update_peak()
+            peak = tracemalloc.get_traced_memory()[1]
+            snapshot = self.take_snapshot()
+            stats = snapshot.compare_to(self.snapshot, "lineno")
+            self.snapshot = snapshot
+            self.phases.append(
+                {
+                    "key": key,
+                    "phase": name,
+                    "step": step,
+                    "allocated": after - before,
+                    "peak": peak - before,
+                    "top": [
+                        {
+                            "site": get_site(stat),
+                            "size": stat.size_diff,
+                            "count": stat.count_diff,
+                        }
+                        for stat in stats[: self.top]
+                    ],
+                }
+            )
+
+    def stop(self, rows):
+        """
+        Returns the report of the profile. Everything still referenced, such
+        as the result of an import, counts as retained.
+        """
+        self.snapshot = None
+        gc.collect()
+        retained = self.update_peak() - self.baseline
+        stats = self.take_snapshot().compare_to(self.baseline_snapshot, "filename")
+        tracemalloc.stop()
+        self.baseline_snapshot = None
+
+        return {
+            "rows": rows,
+            "peak_bytes": self.peak,
+            "peak_bytes_per_row": self.peak / rows,
+            "retained_bytes": retained,
+            "retained_bytes_per_row": retained / rows,
+            "retained_by_file": [
+                {"file": get_site(stat).rsplit(":", 1)[0], "size": stat.size_diff}
+                for stat in stats[: self.top]
+            ],
+            "phases": self.phases,
+        }
+
+
+def profile_importer(importer_class, profile):
+    class ProfiledImporter(importer_class):
+        def measure(self, phase, step=None):
+            return profile.phase(self.key, phase, step)
+
+    return ProfiledImporter
+
+
+def run(scenario, lib, top):
+    person_importer, book_importer, multi_importer = library.build_importers()
+    people = lib.get_people()
+    books = lib.get_books()
+    profile = MemoryProfile(top)
+
+    if scenario == "export":
+        profile.start()
+        with profile.phase(book_importer.key, "export"):
+            result = book_importer().export()
+        with profile.phase(book_importer.key, "get_file"):
+            file = result.get_file("csv")
+        report = profile.stop(len(books))
+        report["file_bytes"] = len(file.getvalue())
+        return report
+
+    if scenario == "multi_import":
+
+        class ProfiledMultiImporter(multi_importer):
+            importers = [
+                profile_importer(importer_class, profile)
+                for importer_class in multi_importer.importers
+            ]
+
+        importer = ProfiledMultiImporter()
+        data = {"person": [("people", people)], "book": [("books", books)]}
+        rows = len(people) + len(books)
+    else:
+        importer_class, data = {
+            "import_person": (person_importer, people),
+            "import_book": (book_importer, books),
+        }[scenario]
+        importer = profile_importer(importer_class, profile)()
+        rows = len(data)
+
+    profile.start()
+    result = importer.import_data(data, commit=False)
+    report = profile.stop(rows)
+    report["valid"] = result.valid
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scenarios", nargs="+", choices=scenarios)
+    parser.add_argument("--max-peak-bytes-per-row", type=float)
+    parser.add_argument("--max-retained-bytes-per-row", type=float)
+    args = parser.parse_args()
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "tests.settings")
+    django.setup()
+    library.create_database()
+
+    lib = library.Library(args.rows, seed=args.seed)
+    lib.populate()
+
+    failures = []
+    for scenario in args.scenarios or scenarios:
+        report = dict(scenario=scenario, **run(scenario, lib, args.top))
+        print(json.dumps(report))
+
+        for name, limit in (
+            ("peak_bytes_per_row", args.max_peak_bytes_per_row),
+            ("retained_bytes_per_row", args.max_retained_bytes_per_row),
+        ):
+            if limit is not None and report[name] > limit:
+                failures.append(
+                    "{0}: {1} of {2:.0f} is over {3:.0f}".format(
+                        scenario, name, report[name], limit
+                    )
+                )
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,46 @@
 from collections import defaultdict
+from functools import reduce
+from operator import or_
 
-from django.core.exceptions import MultipleObjectsReturned
+from django.core.exceptions import (
+    FieldDoesNotExist,
+    FieldError,
+    MultipleObjectsReturned,
+    ValidationError,
+)
+from django.db.models import Q
+
+
+def chunked(values, size):
+    for start in range(0, len(values), size):
+        end = start + size
+        yield values[start:end]
+
+
+def get_model_field(model, field):
+    """
+    Returns the concrete, non-relational model field of a lookup field,
+    optionally suffixed with __iexact, or None.
+    """
+    name = ObjectCache._get_attribute_name(field)
+    opts = model._meta
+
+    try:
+        model_field = opts.pk if name == "pk" else opts.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+    if model_field.is_relation or not model_field.concrete:
+        return None
+    return model_field
+
+
+def is_valid_value(model_field, value):
+    try:
+        model_field.to_python(value)
+    except (TypeError, ValidationError, ValueError):
+        return False
+    return True
 
 
 class CachedObject(object):
@@ -29,13 +69,18 @@ class ObjectCache(object):
     def _get_value_key(field, value):
         return str(value).lower() if field.endswith("__iexact") else str(value)
 
+    @staticmethod
+    def _get_attribute_name(field):
+        return field[: -len("__iexact")] if field.endswith("__iexact") else field
+
     def add(self, obj):
         cached_obj = CachedObject(obj)
 
         fields_to_cache = (
             (field, value)
             for field, value in (
-                (field, getattr(obj, field, None)) for field in self.cache_fields
+                (field, getattr(obj, self._get_attribute_name(field), None))
+                for field in self.cache_fields
             )
             if value is not None
         )
@@ -101,20 +146,227 @@ class ObjectCache(object):
 
 
 class CachedQuery(ObjectCache):
+    """
+    An ObjectCache populated from a queryset on first access.
+
+    By default the whole queryset is loaded. Calling scope() restricts
+    loading to the instances matching the given lookup data, which are
+    fetched with chunked queries per lookup field.
+    """
+
+    chunk_size = 500
+
     def __init__(self, queryset, lookup_fields):
         super(CachedQuery, self).__init__(lookup_fields)
         self.queried = False
         self.queryset = queryset
         self.multiple_objects_error = queryset.model.MultipleObjectsReturned
+        self.scoped = False
+        self.scoped_values = defaultdict(set)
+        self.pending_values = defaultdict(set)
+        self.loaded_pks = set()
+        self.model_fields = {
+            field: get_model_field(queryset.model, field) for field in self.cache_fields
+        }
 
     def get(self, field, value, default=None):
         self._ensure_queried()
         return super(CachedQuery, self).get(field, value, default)
 
+    def scope(self, lookup_data):
+        """
+        Restricts the cache to instances matching an iterable of lookup data
+        dicts, as later passed to match(). May be called several times;
+        only values that have not been queried yet are fetched.
+        """
+        if self.queried and not self.scoped:
+            return
+
+        self.scoped = True
+
+        for data in lookup_data:
+            for field in self.lookup_fields:
+                value = self._get_lookup_value(data, field)
+                if value is None or value in self.scoped_values[field]:
+                    continue
+                self.scoped_values[field].add(value)
+                if self._can_query_value(field, value):
+                    self.pending_values[field].add(value)
+
+        if any(self.pending_values.values()):
+            self.queried = False
+
+    def _get_lookup_value(self, data, field):
+        if isinstance(field, str):
+            value = data.get(field, None)
+        else:
+            value = tuple(data.get(f) for f in field)
+            if any(v is None for v in value):
+                return None
+
+        try:
+            hash(value)
+        except TypeError:
+            return None
+        return value
+
+    def _can_query_value(self, field, value):
+        """
+        Values that the model field can not convert, such as the empty id of
+        a new row, can not match and would make the query of their chunk
+        fail, so they are not queried.
+        """
+        if isinstance(field, str):
+            field = (field,)
+            value = (value,)
+
+        return all(
+            is_valid_value(self.model_fields[f], v)
+            for f, v in zip(field, value)
+            if self.model_fields[f]
+        )
+
     def _ensure_queried(self):
         if self.queried:
             return
 
-        for instance in self.queryset:
-            self.add(instance)
+        if self.scoped:
+            self._query_pending_values()
+        else:
+            for instance in self.queryset:
+                self.add(instance)
         self.queried = True
+
+    def _query_pending_values(self):
+        for field, values in self.pending_values.items():
+            values = list(values)
+            for chunk in chunked(values, self.chunk_size):
+                for instance in self._query_values(field, chunk):
+                    if instance.pk in self.loaded_pks:
+                        continue
+                    self.loaded_pks.add(instance.pk)
+                    self.add(instance)
+        self.pending_values.clear()
+
+    def _query_values(self, field, values):
+        """
+        Queries instances matching any of the values for a lookup field.
+        Values that can still not be used for the field, such as values of
+        related fields, are skipped by splitting the chunk until the
+        offending values are isolated.
+        """
+        try:
+            return list(self.queryset.filter(self._get_filter(field, values)))
+        except (FieldError, TypeError, ValidationError, ValueError):
+            if len(values) == 1:
+                return []
+            middle = len(values) // 2
+            return self._query_values(field, values[:middle]) + self._query_values(
+                field, values[middle:]
+            )
+
+    def _get_filter(self, field, values):
+        if isinstance(field, str) and not field.endswith("__iexact"):
+            return Q(**{"{0}__in".format(field): values})
+
+        if isinstance(field, str):
+            return reduce(or_, (Q(**{field: value}) for value in values))
+
+        return reduce(or_, (Q(**dict(zip(field, value))) for value in values))
+
+
+class RelatedLookupCache(object):
+    """
+    Database matches for the values of a LookupRelatedField, resolved with
+    a few chunked queries per lookup field instead of one query per value.
+
+    Only lookup fields that are concrete, non-relational model fields
+    (optionally suffixed with __iexact) are resolved. get() raises
+    DoesNotExist for values that no lookup field matched, and returns the
+    default for anything it can not answer from the resolved matches, so
+    callers should fall back to querying the database.
+    """
+
+    chunk_size = 500
+
+    def __init__(self, queryset, lookup_fields):
+        self.queryset = queryset
+        self.lookup_fields = lookup_fields
+        self.multiple_objects_error = queryset.model.MultipleObjectsReturned
+        self.does_not_exist_error = queryset.model.DoesNotExist
+        self.model_fields = {
+            field: get_model_field(queryset.model, field) for field in lookup_fields
+        }
+        self.resolved = set()
+        self.keys = defaultdict(dict)
+        self.matches = defaultdict(dict)
+        # Fields the database matched differently than their values, e.g.
+        # with a case insensitive collation, so a missing match is not final
+        self.inexact_fields = set()
+
+    def resolve(self, values):
+        values = set(value for value in values if value) - self.resolved
+        self.resolved.update(values)
+
+        for field, model_field in self.model_fields.items():
+            if not model_field:
+                continue
+
+            keys = self.keys[field]
+            lookup_values = set()
+            for value in values:
+                key = keys[value] = self._get_value_key(field, model_field, value)
+                if key is not None and key not in self.matches[field]:
+                    lookup_values.add(key)
+
+            for key in lookup_values:
+                self.matches[field][key] = []
+
+            for chunk in chunked(list(lookup_values), self.chunk_size):
+                for instance in self.queryset.filter(self._get_filter(field, chunk)):
+                    key = self._get_instance_key(field, model_field, instance)
+                    if key in lookup_values:
+                        self.matches[field][key].append(instance)
+                    else:
+                        self.inexact_fields.add(field)
+
+    def get(self, value, default=None):
+        for field, model_field in self.model_fields.items():
+            if not model_field or value not in self.keys[field]:
+                return default
+
+            key = self.keys[field][value]
+            if key is None:
+                continue
+
+            results = self.matches[field].get(key, [])
+            if len(results) > 1:
+                raise self.multiple_objects_error
+            if results:
+                return results[0]
+            if field in self.inexact_fields:
+                return default
+
+        raise self.does_not_exist_error
+
+    def _get_value_key(self, field, model_field, value):
+        try:
+            key = model_field.to_python(value)
+        except (TypeError, ValidationError, ValueError):
+            return None
+
+        if key is not None and field.endswith("__iexact"):
+            key = str(key).lower()
+        return key
+
+    def _get_instance_key(self, field, model_field, instance):
+        key = getattr(instance, model_field.attname)
+        if field.endswith("__iexact"):
+            key = str(key).lower()
+        return key
+
+    def _get_filter(self, field, values):
+        if field.endswith("__iexact"):
+            return reduce(or_, (Q(**{field: value}) for value in values))
+
+        return Q(**{"{0}__in".format(field): values})
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+
+# Incremented when the format of checkpoint records changes
+version = 1
+
+
+def fingerprint_file(file, block_size=64 * 1024):
+    """
+    Returns a hash of the contents of a file.
+    """
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(block_size), b""):
+        digest.update(block if isinstance(block, bytes) else block.encode("utf-8"))
+    file.seek(0)
+    return digest.hexdigest()
+
+
+def fingerprint_dataset(dataset):
+    """
+    Returns a hash of the headers and rows of a dataset.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps(dataset.headers, cls=DjangoJSONEncoder).encode("utf-8"))
+    for row in dataset:
+        digest.update(json.dumps(row, cls=DjangoJSONEncoder).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class CheckpointStore(object):
+    """
+    Stores the checkpoints of an import as a sequence of records, each
+    holding the progress made since the previous one.
+    """
+
+    def append(self, key, record):
+        raise NotImplementedError()
+
+    def load(self, key):
+        """
+        Returns the records stored for the key, oldest first.
+        """
+        raise NotImplementedError()
+
+    def delete(self, key):
+        raise NotImplementedError()
+
+
+class FileCheckpointStore(CheckpointStore):
+    """
+    Stores checkpoints as files of JSON lines in a local directory.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_path(self, key):
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, "{0}.jsonl".format(name))
+
+    def append(self, key, record):
+        os.makedirs(self.directory, exist_ok=True)
+        line = json.dumps(record, cls=DjangoJSONEncoder) + "\n"
+        with open(self.get_path(key), "a", encoding="utf-8") as f:
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def load(self, key):
+        try:
+            with open(self.get_path(key), encoding="utf-8") as f:
+                lines = f.readlines()
+        except FileNotFoundError:
+            return []
+
+        records = []
+        for line in lines:
+            # A line that was partially written when the process stopped
+            if not line.endswith("\n"):
+                break
+            records.append(json.loads(line))
+        return records
+
+    def delete(self, key):
+        try:
+            os.remove(self.get_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class CacheCheckpointStore(CheckpointStore):
+    """
+    Stores checkpoints in a Django cache, one cache key per record.
+    """
+
+    key_prefix = "multi_import:checkpoint:"
+
+    def __init__(self, alias="default", timeout=None):
+        self.alias = alias
+        self.timeout = timeout
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def get_key(self, key, suffix):
+        return "{0}{1}:{2}".format(self.key_prefix, key, suffix)
+
+    def append(self, key, record):
+        count_key = self.get_key(key, "count")
+        count = self.cache.get(count_key, 0)
+        self.cache.set(self.get_key(key, count), record, self.timeout)
+        self.cache.set(count_key, count + 1, self.timeout)
+
+    def load(self, key):
+        count = self.cache.get(self.get_key(key, "count"), 0)
+        keys = [self.get_key(key, index) for index in range(count)]
+        records = self.cache.get_many(keys)
+
+        result = []
+        for record_key in keys:
+            # Later records can not be used without the ones before them
+            if record_key not in records:
+                break
+            result.append(records[record_key])
+        return result
+
+    def delete(self, key):
+        count = self.cache.get(self.get_key(key, "count"), 0)
+        keys = [self.get_key(key, index) for index in range(count)]
+        self.cache.delete_many(keys + [self.get_key(key, "count")])
@@ -1,14 +1,63 @@
+import heapq
 import zipfile
-from copy import copy
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from functools import partial
 from io import BytesIO
+from itertools import chain, islice
+from operator import attrgetter
 
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from rest_framework.settings import api_settings
 from tablib.core import Dataset
 
-from multi_import.formats import FileFormat
+from multi_import.formats import DatasetStream, FileFormat
 from multi_import.helpers import files
 
+# Size of the chunks of a streaming response
+stream_buffer_size = 64 * 1024
+
+
+def buffered(chunks, size):
+    """
+    Joins chunks of bytes into chunks of at least the given size.
+    """
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b"".join(buffer)
+            buffer = []
+            length = 0
+
+    if buffer:
+        yield b"".join(buffer)
+
+
+class StreamBuffer(object):
+    """
+    A write-only file that is emptied as it is read. As it can not seek,
+    zipfile writes entries with data descriptors after their data.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def read(self):
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
 
 class RowStatus(object):
     unchanged = 1
@@ -21,18 +70,134 @@ class ExportMode(object):
     ITEMIZED = "itemized"
 
 
+def get_column_index(headers):
+    """
+    Returns the position of each header, shared by the RowValues of a dataset.
+    """
+    return {header: index for index, header in enumerate(headers)}
+
+
+class RowValues(Mapping):
+    """
+    A read-only mapping of the values of a row, stored as a tuple aligned to
+    a column index shared by every row of a dataset.
+    """
+
+    __slots__ = ("columns", "values")
+
+    def __init__(self, columns, values):
+        self.columns = columns
+        self.values = values
+
+    def __getitem__(self, key):
+        return self.values[self.columns[key]]
+
+    def __contains__(self, key):
+        return key in self.columns
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def copy(self):
+        return dict(zip(self.columns, self.values))
+
+
+class RowDiff(Mapping):
+    """
+    The changes of a row, as a mapping of each column to its value, or to
+    its original and new values when it changed. Only the original values
+    of changed columns are stored.
+    """
+
+    __slots__ = ("values", "originals")
+
+    def __init__(self):
+        self.values = {}
+        self.originals = None
+
+    def __getitem__(self, key):
+        value = self.values[key]
+        if self.originals and key in self.originals:
+            return [self.originals[key], value]
+        return [value]
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+    def update(self, diff):
+        """
+        Adds a diff in the format of serializers.get_diff_data().
+        """
+        for column, values in diff.items():
+            self.values[column] = values[-1]
+            if len(values) > 1:
+                if self.originals is None:
+                    self.originals = {}
+                self.originals[column] = values[0]
+            elif self.originals:
+                self.originals.pop(column, None)
+
+
 class Row(object):
     """
     Represents a row in an imported Dataset
     """
 
+    __slots__ = (
+        "row_number",
+        "line_number",
+        "data",
+        "diff",
+        "_errors",
+        "_status",
+        "_result",
+        "_position",
+    )
+
     def __init__(self, row_number, line_number, data):
         self.row_number = row_number
         self.line_number = line_number
         self.data = data
-        self.errors = None
-        self.status = None
         self.diff = None
+        self._errors = None
+        self._status = None
+        # The ImportResult indexing the row, and its position in it
+        self._result = None
+        self._position = None
+
+    @property
+    def errors(self):
+        return self._errors
+
+    @errors.setter
+    def errors(self, errors):
+        had_errors = bool(self._errors)
+        self._errors = errors
+        if self._result is not None and had_errors != bool(errors):
+            self._result.reindex_errors(self)
+
+    @property
+    def status(self):
+        return self._status
+
+    @status.setter
+    def status(self, status):
+        previous = self._status
+        self._status = status
+        if self._result is not None and previous != status:
+            self._result.reindex_status(self, previous)
 
     def set_error(self, message):
         self.errors = {api_settings.NON_FIELD_ERRORS_KEY: [message]}
@@ -46,10 +211,10 @@ class Row(object):
         return {
             "row_number": self.row_number,
             "line_number": self.line_number,
-            "data": self.data,
+            "data": dict(self.data),
             "errors": self.errors,
             "status": self.status,
-            "diff": self.diff,
+            "diff": dict(self.diff) if self.diff is not None else None,
         }
 
     @classmethod
@@ -65,21 +230,83 @@ class Row(object):
         return row
 
 
+# Index of the rows with errors, alongside the index of each RowStatus
+ERRORS = "errors"
+
+
 class ImportResult(object):
-    def __init__(self, key, headers=None, rows=None, error=None):
+    """
+    The rows of an import. Rows are indexed by status, and by whether they
+    have errors, as they are added with add_row() and as they change.
+    """
+
+    def __init__(
+        self, key, headers=None, rows=None, error=None, post_save_validated=True
+    ):
         self.key = key
         self.error = error
         self.headers = headers
-        self.rows = rows or []
+        # False when the post save validators of some rows were not run, as
+        # for new rows of a dry run
+        self.post_save_validated = post_save_validated
+        self.rows = []
+        # The rows of each index, in the order they were indexed
+        self.indexes = {}
+        # Indexes whose rows are no longer in the order of self.rows
+        self.unordered_indexes = set()
+        # ImportMetrics, when collected
+        self.metrics = None
+
+        for row in rows or []:
+            self.add_row(row)
+
+    def add_row(self, row):
+        row._result = self
+        row._position = len(self.rows)
+        self.rows.append(row)
+
+        self.index_row(row.status, row)
+        if row.errors:
+            self.index_row(ERRORS, row)
+
+    def reindex_status(self, row, previous_status):
+        del self.indexes[previous_status][row]
+        self.index_row(row.status, row)
+
+    def reindex_errors(self, row):
+        if row.errors:
+            self.index_row(ERRORS, row)
+        else:
+            del self.indexes[ERRORS][row]
+
+    def index_row(self, index, row):
+        rows = self.indexes.setdefault(index, {})
+        if rows and next(reversed(rows))._position > row._position:
+            self.unordered_indexes.add(index)
+        rows[row] = None
+
+    def get_rows(self, index):
+        rows = self.indexes.get(index)
+        if not rows:
+            return []
+
+        if index in self.unordered_indexes:
+            self.unordered_indexes.discard(index)
+            rows = dict.fromkeys(sorted(rows, key=attrgetter("_position")))
+            self.indexes[index] = rows
+        return list(rows)
+
+    def count(self, index):
+        return len(self.indexes.get(index, ()))
 
     @property
     def valid(self):
-        return not self.error and not any(row.errors for row in self.rows)
+        return not self.error and not self.count(ERRORS)
 
     @property
     def errors(self):
         result = []
-        for row in (row for row in self.rows if row.errors):
+        for row in self.get_rows(ERRORS):
             for key, messages in row.errors.items():
                 for message in messages:
                     error = {
@@ -94,25 +321,39 @@ class ImportResult(object):
 
     @property
     def new_rows(self):
-        return [row for row in self.rows if row.status == RowStatus.new]
+        return self.get_rows(RowStatus.new)
 
     @property
     def updated_rows(self):
-        return [row for row in self.rows if row.status == RowStatus.update]
+        return self.get_rows(RowStatus.update)
 
     @property
     def unchanged_rows(self):
-        return [row for row in self.rows if row.status == RowStatus.unchanged]
+        return self.get_rows(RowStatus.unchanged)
 
     @property
     def changes(self):
-        return [row for row in self.rows if row.status != RowStatus.unchanged]
+        indexes = [
+            self.get_rows(status)
+            for status in list(self.indexes)
+            if status != RowStatus.unchanged and status != ERRORS
+        ]
+        return list(heapq.merge(*indexes, key=attrgetter("_position")))
+
+    @property
+    def num_changes(self):
+        return len(self.rows) - self.count(RowStatus.unchanged)
+
+    @property
+    def has_changes(self):
+        return self.num_changes > 0
 
     def to_json(self):
         return {
             "key": self.key,
             "headers": self.headers,
             "rows": [row.to_json() for row in self.rows],
+            "post_save_validated": self.post_save_validated,
         }
 
     @classmethod
@@ -121,6 +362,7 @@ class ImportResult(object):
             key=data["key"],
             headers=data["headers"],
             rows=[Row.from_json(row) for row in data["rows"]],
+            post_save_validated=data.get("post_save_validated", True),
         )
 
 
@@ -132,6 +374,8 @@ class MultiImportResult(object):
     def __init__(self):
         self.files = []
         self.errors = {}
+        # MultiImportMetrics, when collected
+        self.metrics = None
 
     @property
     def valid(self):
@@ -147,10 +391,14 @@ class MultiImportResult(object):
         self.errors[filename] = [{"message": message}]
 
     def num_changes(self):
-        return sum(len(file["result"].changes) for file in self.files)
+        return sum(file["result"].num_changes for file in self.files)
 
     def has_changes(self):
-        return any(file["result"].changes for file in self.files)
+        return any(file["result"].has_changes for file in self.files)
+
+    @property
+    def post_save_validated(self):
+        return all(file["result"].post_save_validated for file in self.files)
 
     def to_json(self):
         return {
@@ -196,13 +444,46 @@ class ExportResult(object):
         response["Content-Disposition"] = header
         return response
 
+    def iter_file(self, file_format=None):
+        """
+        Yields the file in chunks of bytes, encoding rows as they are read
+        from the dataset.
+        """
+        format = self._get_format(file_format)
+        chunks = format.write_stream(self.dataset.headers, self.iter_rows(format))
+        return buffered(chunks, stream_buffer_size)
+
+    def iter_rows(self, file_format=None):
+        format = self._get_format(file_format)
+        rows = iter(self.dataset)
+        if self.empty and format.empty_file_requires_example_row:
+            rows = chain(rows, [self.example_row])
+        return rows
+
+    def get_streaming_http_response(self, file_format=None, filename=None):
+        format = self._get_format(file_format)
+
+        filename = "{0}.{1}".format(filename or self.filename, format.extension)
+
+        response = StreamingHttpResponse(
+            self.iter_file(format), content_type=format.content_type
+        )
+        header = "attachment; filename={0}".format(filename)
+        response["Content-Disposition"] = header
+        return response
+
     def _get_format(self, file_format):
         return files.find_format(self.file_formats, file_format)
 
     def _get_dataset(self, format) -> Dataset:
         dataset = self.dataset
-        if self.empty and format.empty_file_requires_example_row:
-            dataset = copy(dataset)
+        requires_example_row = self.empty and format.empty_file_requires_example_row
+
+        # Copies of a Dataset share its rows, so the rows are copied as well
+        if isinstance(dataset, DatasetStream) or requires_example_row:
+            dataset = Dataset(*dataset, headers=dataset.headers)
+
+        if requires_example_row:
             dataset.append(self.example_row)
         return dataset
 
@@ -212,10 +493,15 @@ class MultiExportResult(object):
     A collection of ExportResults
     """
 
-    def __init__(self, filename, file_formats, results):
+    # Items encoded at a time by the workers of an itemized export
+    encode_chunk_size = 1000
+
+    def __init__(self, filename, file_formats, results, workers=None):
         self.file_formats = file_formats
         self.filename = filename
         self.results = results
+        # Processes used to encode the items of an itemized export
+        self.workers = workers
 
     def get_file(
         self, file_format: FileFormat = None, export_mode: str = None
@@ -230,10 +516,12 @@ class MultiExportResult(object):
 
         file = BytesIO()
 
-        with zipfile.ZipFile(file, "w") as zf:
+        with self._get_executor(export_mode) as executor, zipfile.ZipFile(
+            file, "w"
+        ) as zf:
             for result in self.results:
                 if export_mode == ExportMode.ITEMIZED:
-                    self._write_tree_export(format, result, zf)
+                    self._write_tree_export(format, result, zf, executor)
                 else:
                     self._write_tabular_export(format, result, zf)
 
@@ -263,23 +551,124 @@ class MultiExportResult(object):
         response["Content-Disposition"] = header
         return response
 
+    def iter_file(self, file_format: FileFormat = None, export_mode: str = None):
+        """
+        Yields the file in chunks of bytes. Zip file entries are written
+        as their rows are encoded, without building the archive in memory.
+        """
+        format = self._get_format(file_format)
+
+        if not export_mode:
+            export_mode = ExportMode.GROUPED
+
+        if self._is_single_content_type_export() and export_mode == ExportMode.GROUPED:
+            return self.results[0].iter_file(format)
+
+        return buffered(self._iter_zip_file(format, export_mode), stream_buffer_size)
+
+    def get_streaming_http_response(
+        self,
+        file_format: FileFormat = None,
+        filename: str = None,
+        export_mode: str = None,
+    ) -> StreamingHttpResponse:
+        """Return a streaming HTTP response of the ExportResults as a zip file"""
+        format = self._get_format(file_format)
+
+        if not export_mode:
+            export_mode = ExportMode.GROUPED
+
+        if self._is_single_content_type_export() and export_mode == ExportMode.GROUPED:
+            return self.results[0].get_streaming_http_response(format, filename)
+
+        content_type = "application-x-zip-compressed"
+        filename = "{0}.zip".format(filename or self.filename)
+
+        response = StreamingHttpResponse(
+            self.iter_file(format, export_mode), content_type=content_type
+        )
+        header = "attachment; filename={0}".format(filename)
+        response["Content-Disposition"] = header
+        return response
+
+    def _iter_zip_file(self, format: FileFormat, export_mode: str):
+        stream = StreamBuffer()
+
+        # Entries are compressed, as streaming readers can not find the end
+        # of stored entries that are followed by data descriptors. Their size
+        # is not known before they are written, so they are always written
+        # with ZIP64 headers, which allows them to be larger than 2 GiB.
+        with self._get_executor(export_mode) as executor, zipfile.ZipFile(
+            stream, "w", compression=zipfile.ZIP_DEFLATED
+        ) as zf:
+            for result in self.results:
+                if export_mode == ExportMode.ITEMIZED:
+                    entries = (
+                        (file_name, [contents])
+                        for file_name, contents in self._iter_tree_export(
+                            format, result, executor
+                        )
+                    )
+                else:
+                    entries = self._iter_tabular_export(format, result)
+
+                for file_name, chunks in entries:
+                    with zf.open(file_name, "w", force_zip64=True) as entry:
+                        for chunk in chunks:
+                            entry.write(chunk)
+                            yield stream.read()
+                    yield stream.read()
+
+        yield stream.read()
+
+    def _iter_tree_export(self, format: FileFormat, result: ExportResult, executor):
+        """
+        Yields the file name and contents of each exported content item.
+        Items are encoded in chunks, by the executor's processes if any,
+        and yielded in order.
+        """
+        headers = result.dataset.headers
+        encode = partial(format.write_record, headers)
+        rows = result.iter_rows(format)
+
+        chunk = list(islice(rows, self.encode_chunk_size))
+        # Files are named by the id_column, so results without rows, which
+        # have no files, do not need one
+        if not chunk:
+            return
+        id_index = headers.index(result.id_column)
+
+        while chunk:
+            if executor is not None:
+                records = executor.map(
+                    encode, chunk, chunksize=self._get_map_chunksize(chunk)
+                )
+            else:
+                records = map(encode, chunk)
+
+            for row, contents in zip(chunk, records):
+                file_name = f"{result.filename}/{row[id_index]}.{format.extension}"
+                yield file_name, contents
+
+            chunk = list(islice(rows, self.encode_chunk_size))
+
+    def _iter_tabular_export(self, format: FileFormat, result: ExportResult):
+        file_name = "{0}.{1}".format(result.filename, format.extension)
+        yield file_name, result.iter_file(format)
+
     def _write_tree_export(
-        self, format: FileFormat, result: ExportResult, file: zipfile.ZipFile
+        self,
+        format: FileFormat,
+        result: ExportResult,
+        file: zipfile.ZipFile,
+        executor=None,
     ) -> None:
         """
         Write exported content items in individual files with the items'
         id_column value as the filenames.
         """
-        dataset = result.get_dataset(format)
-
-        for row in dataset:
-            directory_name = result.filename
-            new_ds = Dataset(headers=dataset.headers)
-            new_ds.append(row)
-            file_contents = format.write(new_ds)
-            item_id = new_ds.dict[0][result.id_column]
-            file_name = f"{item_id}.{format.extension}"
-            file.writestr(f"{directory_name}/{file_name}", file_contents.getvalue())
+        for file_name, contents in self._iter_tree_export(format, result, executor):
+            file.writestr(file_name, contents)
 
     def _write_tabular_export(
         self, format: FileFormat, result: ExportResult, file: zipfile.ZipFile
@@ -295,5 +684,13 @@ class MultiExportResult(object):
     def _get_format(self, file_format: FileFormat) -> FileFormat:
         return files.find_format(self.file_formats, file_format)
 
+    def _get_executor(self, export_mode: str):
+        if self.workers and export_mode == ExportMode.ITEMIZED:
+            return ProcessPoolExecutor(self.workers)
+        return nullcontext()
+
+    def _get_map_chunksize(self, chunk) -> int:
+        return max(1, len(chunk) // (self.workers * 4))
+
     def _is_single_content_type_export(self) -> bool:
         return len(self.results) == 1
@@ -39,6 +39,14 @@ class LookupRelatedField(relations.RelatedField):
     def related_model(self):
         return self.queryset.model
 
+    @property
+    def related_lookup_cache(self):
+        field = (
+            self.parent if isinstance(self.parent, relations.ManyRelatedField) else self
+        )
+        key = (type(field.parent), field.field_name)
+        return self.context.get("related_lookups", {}).get(key)
+
     @property
     def new_object_cache(self):
         return (
@@ -67,6 +75,13 @@ class LookupRelatedField(relations.RelatedField):
         return None
 
     def search_database(self, queryset, value):
+        related_lookup_cache = self.related_lookup_cache
+        if related_lookup_cache:
+            # Raises DoesNotExist for resolved values that match nothing
+            match = related_lookup_cache.get(value)
+            if match:
+                return match
+
         for attribute in self.lookup_fields:
             try:
                 return queryset.get(**{attribute: value})
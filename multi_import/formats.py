@@ -1,14 +1,17 @@
+import csv as pycsv
 import json as pyjson
 from csv import Error as NullError
-from io import BytesIO, StringIO
+from io import BytesIO, StringIO, TextIOWrapper
+from itertools import islice
 
-import chardet
 import yaml as pyyaml
 from django.utils.translation import gettext_lazy as _
+from openpyxl import load_workbook
 from tablib.core import Dataset, InvalidDimensions, UnsupportedFormat
 from tablib.formats import registry
 
 from multi_import.exceptions import InvalidFileError
+from multi_import.helpers import charsets
 
 _csv = registry.get_format("csv")
 _json = registry.get_format("json")
@@ -22,8 +25,136 @@ except ImportError:
     CSafeDumper = None
 
 
+invalid_dimensions_message = _(
+    "File must not be empty, and all rows must have same columns/properties."
+)
+
+
+class DatasetStream(object):
+    """
+    A dataset whose rows are read lazily from a file, in place of a tablib
+    Dataset. Iterating yields one tuple of values per row; headers are
+    available up front.
+    """
+
+    headers = None
+
+    def __iter__(self):
+        raise NotImplementedError()
+
+
+class CsvStream(DatasetStream):
+    """
+    Decodes and parses a CSV file incrementally. Like tablib, blank lines are
+    skipped and short rows are padded to the width of the headers.
+    """
+
+    def __init__(self, file_handler, encoding, delimiter=","):
+        self.file_handler = file_handler
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.headers = next(self._read_rows(), None)
+
+    def __iter__(self):
+        rows = self._read_rows()
+        next(rows, None)
+        width = len(self.headers or ())
+
+        for row in rows:
+            if not row:
+                continue
+            if len(row) > width:
+                raise InvalidFileError(invalid_dimensions_message)
+            if len(row) < width:
+                row += [""] * (width - len(row))
+            yield tuple(row)
+
+    def _read_rows(self):
+        count = 0
+        try:
+            for row in self._read_encoded_rows():
+                count += 1
+                yield row
+        except UnicodeDecodeError:
+            if self.encoding == charsets.fallback_encoding:
+                raise InvalidFileError(_("File encoding not identified."))
+
+            # The rest of the file did not match the sample, so like
+            # charsets.decode() it is read with the fallback encoding,
+            # after the rows that were already read
+            self.encoding = charsets.fallback_encoding
+            yield from islice(self._read_encoded_rows(), count, None)
+
+    def _read_encoded_rows(self):
+        self.file_handler.seek(0)
+        text = TextIOWrapper(self.file_handler, encoding=self.encoding, newline="")
+
+        try:
+            yield from pycsv.reader(text, delimiter=self.delimiter)
+        except pycsv.Error:
+            raise InvalidFileError(_("Invalid File."))
+        finally:
+            # Leave the underlying file open
+            text.detach()
+
+
+class XlsxStream(DatasetStream):
+    """
+    Reads the active sheet of an xlsx workbook row by row, using openpyxl's
+    read-only mode. Integral floats are converted to ints, since Excel
+    stores every number as a float.
+    """
+
+    def __init__(self, file_handler):
+        self.file_handler = file_handler
+        headers = next(self._read_rows(), None)
+        self.headers = list(headers) if headers is not None else None
+
+    def __iter__(self):
+        rows = self._read_rows()
+        next(rows, None)
+        width = len(self.headers or ())
+
+        for row in rows:
+            if len(row) > width:
+                raise InvalidFileError(invalid_dimensions_message)
+
+            values = tuple(
+                (
+                    int(value)
+                    if isinstance(value, float) and value.is_integer()
+                    else value
+                )
+                for value in row
+            )
+            if len(values) < width:
+                values += ("",) * (width - len(values))
+            yield values
+
+    def _read_rows(self):
+        self.file_handler.seek(0)
+
+        try:
+            workbook = load_workbook(self.file_handler, read_only=True, data_only=True)
+        except Exception:
+            raise InvalidFileError(_("Empty or Invalid File."))
+
+        try:
+            yield from workbook.active.iter_rows(values_only=True)
+        finally:
+            workbook.close()
+
+
 class FileFormat(object):
     title = None
+    content_type = None
+    supports_streaming = False
+
+    # Used to identify files without parsing them, see files.sniff_format()
+    magic_numbers = ()
+    leading_characters = None
+    extra_extensions = ()
+    extra_content_types = ()
 
     @property
     def key(self):
@@ -33,6 +164,15 @@ class FileFormat(object):
     def extension(self):
         return self.key
 
+    @property
+    def extensions(self):
+        return (self.extension,) + tuple(self.extra_extensions)
+
+    @property
+    def content_types(self):
+        content_types = (self.content_type,) if self.content_type else ()
+        return content_types + tuple(self.extra_content_types)
+
     def detect(self, file_handler, file_contents):
         return False
 
@@ -42,9 +182,35 @@ class FileFormat(object):
     def read(self, file_handler, file_contents):
         raise NotImplementedError()
 
+    def detect_sample(self, sample):
+        """
+        Detects the format from the decoded start of a file, trimmed to
+        complete lines. Only used for formats that support streaming.
+        """
+        return False
+
+    def stream(self, file_handler, encoding):
+        raise NotImplementedError()
+
     def write(self, dataset):
         raise NotImplementedError()
 
+    def write_stream(self, headers, rows):
+        """
+        Yields the file as chunks of bytes while rows are produced. Formats
+        that can not encode rows one at a time write the whole file at once.
+        """
+        dataset = Dataset(headers=headers)
+        for row in rows:
+            dataset.append(row)
+        yield self.write(dataset).getvalue()
+
+    def write_record(self, headers, row):
+        """
+        Returns a file of a single row as bytes.
+        """
+        return b"".join(self.write_stream(headers, [row]))
+
 
 class TabLibFileFormat(FileFormat):
     def __init__(
@@ -53,11 +219,13 @@ class TabLibFileFormat(FileFormat):
         content_type,
         read_file_as_string=False,
         empty_file_requires_example_row=False,
+        magic_numbers=(),
     ):
         self.format = file_format
         self.content_type = content_type
         self.read_file_as_string = read_file_as_string
         self.empty_file_requires_example_row = empty_file_requires_example_row
+        self.magic_numbers = magic_numbers
 
     @property
     def key(self):
@@ -108,6 +276,9 @@ class TabLibFileFormat(FileFormat):
 
 
 class CsvFormat(TabLibFileFormat):
+    supports_streaming = True
+    extra_content_types = ("text/csv",)
+
     def __init__(self):
         super(CsvFormat, self).__init__(
             _csv, "application/csv", read_file_as_string=True
@@ -117,12 +288,15 @@ class CsvFormat(TabLibFileFormat):
     def ensure_unicode(cls, file_contents):
         if isinstance(file_contents, str):
             return file_contents
-        charset = chardet.detect(file_contents)
-        encoding = charset["encoding"]
-        encoding_confidence = charset["confidence"]
-        if encoding and encoding_confidence > 0.5:
-            return file_contents.decode(encoding.lower()).encode("utf8")
-        else:
+        encoding = charsets.detect_encoding(
+            file_contents[: charsets.sample_size],
+            final=len(file_contents) <= charsets.sample_size,
+        )
+        if not encoding:
+            raise InvalidFileError(_("Unknown file type."))
+        try:
+            return file_contents.decode(encoding)
+        except UnicodeDecodeError:
             raise InvalidFileError(_("Unknown file type."))
 
     def pre_read(self, file_object):
@@ -139,8 +313,55 @@ class CsvFormat(TabLibFileFormat):
             pass
         return False
 
+    def detect_sample(self, sample):
+        # Binary formats and JSON are never streamed as CSV
+        if "\x00" in sample or sample.lstrip()[:1] in ("[", "{"):
+            return False
+
+        try:
+            Dataset().load(sample, "csv")
+            return not _yaml.detect(StringIO(sample))
+        except (InvalidDimensions, UnsupportedFormat, AttributeError, NullError):
+            pass
+        return False
+
+    def stream(self, file_handler, encoding):
+        return CsvStream(file_handler, encoding)
+
+    def write_stream(self, headers, rows):
+        buffer = StringIO()
+        writer = pycsv.writer(buffer)
+
+        if headers:
+            writer.writerow(headers)
+
+        for row in rows:
+            writer.writerow(row)
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+
+        yield buffer.getvalue().encode("utf-8")
+
+
+class XlsxFormat(TabLibFileFormat):
+    supports_streaming = True
+
+    def __init__(self):
+        super(XlsxFormat, self).__init__(
+            _xlsx,
+            "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            # ZIP archive
+            magic_numbers=(b"PK\x03\x04",),
+        )
+
+    def stream(self, file_handler, encoding):
+        return XlsxStream(file_handler)
+
 
 class JsonFormat(TabLibFileFormat):
+    leading_characters = "["
+
     def __init__(self):
         super(JsonFormat, self).__init__(
             _json,
@@ -157,19 +378,103 @@ class JsonFormat(TabLibFileFormat):
             indent=2,
         )
 
+    def write_stream(self, headers, rows):
+        # Matches the output of export_set, one list item at a time
+        separator = "[\n"
+        for row in rows:
+            item = pyjson.dumps(
+                dict(zip(headers, row)),
+                ensure_ascii=False,
+                sort_keys=False,
+                indent=2,
+            )
+            yield (separator + "  " + item.replace("\n", "\n  ")).encode("utf-8")
+            separator = ",\n"
+
+        yield b"[]" if separator == "[\n" else b"\n]"
+
+
+class NdjsonFormat(FileFormat):
+    """
+    Newline delimited JSON, with one object per row.
+    """
+
+    title = "ndjson"
+    content_type = "application/x-ndjson"
+    leading_characters = "{"
+    extra_extensions = ("jsonl",)
+    empty_file_requires_example_row = True
+
+    def detect(self, file_handler, file_contents):
+        try:
+            return bool(self._load_rows(file_contents))
+        except (TypeError, ValueError):
+            return False
+
+    def read(self, file_handler, file_contents):
+        try:
+            rows = self._load_rows(file_contents)
+        except (TypeError, ValueError):
+            raise InvalidFileError(_("Empty or Invalid File."))
+
+        if not rows:
+            raise InvalidFileError(_("Empty or Invalid File."))
+
+        dataset = Dataset()
+        dataset.dict = rows
+        return dataset
+
+    def export_set(self, dataset):
+        return "".join(
+            pyjson.dumps(row, ensure_ascii=False, sort_keys=False) + "\n"
+            for row in dataset.dict
+        )
+
+    def write(self, dataset):
+        f = BytesIO()
+        f.write(self.export_set(dataset).encode("utf-8"))
+        return f
+
+    def write_stream(self, headers, rows):
+        for row in rows:
+            line = pyjson.dumps(dict(zip(headers, row)), ensure_ascii=False)
+            yield (line + "\n").encode("utf-8")
+
+    def _load_rows(self, file_contents):
+        rows = [pyjson.loads(line) for line in file_contents.splitlines() if line]
+        if not all(isinstance(row, dict) for row in rows):
+            raise ValueError()
+        return rows
+
 
 class YamlFormat(TabLibFileFormat):
+    extra_extensions = ("yml",)
+    extra_content_types = ("text/yaml", "application/yaml")
+
     def __init__(self):
         super(YamlFormat, self).__init__(
             _yaml, "application/x-yaml", empty_file_requires_example_row=True
         )
 
     def export_set(self, dataset):
+        return self.dump(dataset._package())
+
+    def write_stream(self, headers, rows):
+        # Block sequences can be concatenated, one single-item list per row
+        empty = True
+        for row in rows:
+            empty = False
+            yield self.dump([dict(zip(headers, row))]).encode("utf-8")
+
+        if empty:
+            yield self.dump([]).encode("utf-8")
+
+    def dump(self, data):
         # By default use the C-based CSafeDumper,
         # otherwise fallback to pure Python SafeDumper.
         if CSafeDumper:
             return pyyaml.dump(
-                dataset._package(),
+                data,
                 Dumper=CSafeDumper,
                 allow_unicode=True,
                 default_flow_style=False,
@@ -177,7 +482,7 @@ class YamlFormat(TabLibFileFormat):
             )
         else:
             return pyyaml.safe_dump(
-                dataset._package(),
+                data,
                 allow_unicode=True,
                 default_flow_style=False,
                 sort_keys=False,
@@ -188,6 +493,10 @@ class TxtFormat(FileFormat):
     title = "txt"
     content_type = "text/plain"
 
+    # Text files are only written, so are never identified on import
+    extensions = ()
+    content_types = ()
+
     def detect(self, file_handler, file_contents):
         return False
 
@@ -214,17 +523,23 @@ csv = CsvFormat()
 
 txt = TxtFormat()
 
-xls = TabLibFileFormat(_xls, "application/vnd.ms-excel", read_file_as_string=True)
-
-xlsx = TabLibFileFormat(
-    _xlsx, "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+xls = TabLibFileFormat(
+    _xls,
+    "application/vnd.ms-excel",
+    read_file_as_string=True,
+    # OLE2 compound document
+    magic_numbers=(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1",),
 )
 
+xlsx = XlsxFormat()
+
 json = JsonFormat()
 
 yaml = YamlFormat()
 
-all_formats = (xlsx, xls, csv, json, yaml, txt)
+ndjson = NdjsonFormat()
+
+all_formats = (xlsx, xls, csv, json, yaml, ndjson, txt)
 
 supported_mimetypes = (
     "text/plain",
@@ -234,6 +549,7 @@ supported_mimetypes = (
     "application/json",
     "application/x-yaml",
     "text/yaml",
+    "application/x-ndjson",
     # When Content-Type unspecified, defaults to this.
     # https://sdelements.atlassian.net/browse/LIBR-355
     # https://stackoverflow.com/questions/12061030/why-am-i-getting-mime-type-of-csv-file-as-application-octet-stream
@@ -0,0 +1,56 @@
+import codecs
+
+import chardet
+
+# Bytes inspected to detect the encoding of a file
+sample_size = 64 * 1024
+
+# Used when the encoding can not be detected, as it decodes any bytes
+fallback_encoding = "ISO-8859-1"
+
+byte_order_marks = (
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+)
+
+
+def detect_encoding(sample, final=False):
+    """
+    Detects the encoding of a file from a sample at its start: a byte order
+    mark, then valid UTF-8, then chardet. Unless final, a character cut at
+    the end of the sample is ignored. Returns None if not identified.
+    """
+    for bom, encoding in byte_order_marks:
+        if sample.startswith(bom):
+            return encoding
+
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=final)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+
+    charset = chardet.detect(sample[:sample_size])
+    encoding = charset["encoding"]
+    if not encoding or charset["confidence"] <= 0.5:
+        return None
+
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+
+def decode(contents):
+    """
+    Decodes file contents once, with the encoding detected from a sample.
+    """
+    sample = contents[:sample_size]
+    encoding = detect_encoding(sample, final=len(contents) <= sample_size)
+
+    try:
+        return contents.decode(encoding or fallback_encoding)
+    except UnicodeDecodeError:
+        # The rest of the file did not match the sample
+        return contents.decode(fallback_encoding)
@@ -1,3 +1,5 @@
+from functools import partial
+
 from rest_framework import relations
 
 from multi_import.helpers import strings
@@ -38,3 +40,17 @@ def from_string_representation(field, value):
         for val in value.split(list_separator)
         if val and not val.isspace()
     ]
+
+
+def get_from_string_converter(field):
+    """
+    Resolves from_string_representation() for a field ahead of time.
+    Returns None when values are used as they are.
+    """
+    if hasattr(field, "from_string_representation"):
+        return field.from_string_representation
+
+    if not isinstance(field, relations.ManyRelatedField):
+        return None
+
+    return partial(from_string_representation, field)
@@ -1,8 +1,12 @@
+import codecs
+import os
+
 import tablib
 from django.utils.translation import gettext_lazy as _
 
 from multi_import.exceptions import InvalidFileError
 from multi_import.formats import FileFormat
+from multi_import.helpers import charsets
 
 
 def find_format(file_formats, file_format=None):
@@ -12,26 +16,151 @@ def find_format(file_formats, file_format=None):
     return next((f for f in file_formats if f.key == file_format), file_formats[0])
 
 
+# Bytes read from the start of a file to detect streamed formats
+sample_size = 64 * 1024
+
+# Bytes read from the start of a file to sniff its format
+sniff_size = 2048
+
+
 def decode_contents(file_contents):
-    encodings = ["UTF-8", "UTF-16", "ISO-8859-1"]
+    return charsets.decode(file_contents)
 
-    for encoding in encodings:
-        try:
-            return file_contents.decode(encoding)
-        except UnicodeDecodeError:
-            pass
 
-    raise InvalidFileError(_("File encoding not identified."))
+def decode_sample(sample, final=True):
+    """
+    Decodes the start of a file. Unless final, a character cut at the end of
+    the sample is ignored, and the text is trimmed to complete lines.
+    Returns the encoding and the decoded text.
+    """
+    encoding = charsets.detect_encoding(sample, final=final)
+    encoding = encoding or charsets.fallback_encoding
+
+    try:
+        text = codecs.getincrementaldecoder(encoding)().decode(sample, final=final)
+    except UnicodeDecodeError:
+        raise InvalidFileError(_("File encoding not identified."))
+
+    if not final and "\n" in text:
+        text = text[: text.rfind("\n") + 1]
+    return encoding, text
+
+
+def sniff_format(file_formats, file, sample):
+    """
+    Identifies the format of a file without parsing it, from its magic
+    numbers, or from its name and content type checked against the leading
+    characters of the sample. Returns None when the format is ambiguous.
+    """
+    for file_format in file_formats:
+        if any(sample.startswith(magic) for magic in file_format.magic_numbers):
+            return file_format
+
+    try:
+        _encoding, text = decode_sample(sample[:sniff_size], final=False)
+    except InvalidFileError:
+        return None
+
+    if "\x00" in text:
+        return None
+
+    text_formats = [f for f in file_formats if not f.magic_numbers]
+    hints = []
+
+    name = getattr(file, "name", None)
+    if name:
+        extension = os.path.splitext(str(name))[1].lstrip(".").lower()
+        hints.append([f for f in text_formats if extension in f.extensions])
+
+    content_type = getattr(file, "content_type", None)
+    if content_type:
+        hints.append([f for f in text_formats if content_type in f.content_types])
+
+    # Each hint has to be unambiguous, and they have to agree
+    hints = [set(hint) for hint in hints if hint]
+    if any(len(hint) > 1 for hint in hints):
+        return None
+    hinted = set.intersection(*hints) if hints else set()
+    if hints and not hinted:
+        return None
+
+    leading = text.lstrip("\ufeff \t\r\n")[:1]
+    claimants = [
+        f
+        for f in text_formats
+        if leading and f.leading_characters and leading in f.leading_characters
+    ]
 
+    if not hinted:
+        return claimants[0] if len(claimants) == 1 else None
+
+    file_format = hinted.pop()
+    if file_format.leading_characters and file_format not in claimants:
+        return None
+    if claimants and file_format not in claimants:
+        return None
+    return file_format
+
+
+def read_stream(file_formats, file):
+    """
+    Returns a DatasetStream for the file if it is identified as a format
+    that supports streaming, otherwise None.
+    """
+    file.seek(0)
+    sample = file.read(sample_size)
+    file.seek(0)
+
+    file_format = sniff_format(file_formats, file, sample)
+    if file_format and not file_format.supports_streaming:
+        return None
+
+    # Binary formats are streamed without decoding
+    if file_format and file_format.magic_numbers:
+        return file_format.stream(file, None)
+
+    encoding, text = decode_sample(sample, final=len(sample) < sample_size)
+
+    if file_format:
+        return file_format.stream(file, encoding)
+
+    for file_format in file_formats:
+        if file_format.supports_streaming and file_format.detect_sample(text):
+            return file_format.stream(file, encoding)
+
+    return None
+
+
+def read(file_formats, file, stream=False):
+    if stream:
+        dataset = read_stream(file_formats, file)
+        if dataset is not None:
+            return dataset
 
-def read(file_formats, file):
     file.seek(0)
     file_contents = file.read()
-    decoded_file_contents = decode_contents(file_contents)
+
+    # Only trial parse the formats when sniffing is not conclusive
+    sniffed_format = sniff_format(file_formats, file, file_contents[:sniff_size])
+    if sniffed_format:
+        file_formats = (sniffed_format,)
+
+    # Sniffed text formats are trusted, binary ones are still checked
+    trusted = sniffed_format is not None and not sniffed_format.magic_numbers
+
+    # Binary formats that are read from the file handler are not decoded
+    reads_file_handler = (
+        sniffed_format is not None
+        and sniffed_format.magic_numbers
+        and not getattr(sniffed_format, "read_file_as_string", True)
+    )
+    decoded_file_contents = (
+        None if reads_file_handler else decode_contents(file_contents)
+    )
 
     for file_format in file_formats:
         try:
-            if file_format.detect(file, decoded_file_contents):
+            if trusted or file_format.detect(file, decoded_file_contents):
                 return file_format.read(file, decoded_file_contents)
         except AttributeError:
             pass
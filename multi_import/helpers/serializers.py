@@ -1,7 +1,17 @@
 from collections import namedtuple
 
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Model
+from django.db.models.signals import post_save, pre_save
 from rest_framework import relations
-
+from rest_framework.serializers import BaseSerializer, ModelSerializer
+from rest_framework.validators import (
+    BaseUniqueForValidator,
+    UniqueTogetherValidator,
+    UniqueValidator,
+)
+
+from multi_import.fields import LookupRelatedField
 from multi_import.helpers import fields, strings
 
 FieldChange = namedtuple("FieldChange", ["field", "old", "new", "value"])
@@ -23,6 +33,26 @@ def get_many_related_fields(serializer):
     ]
 
 
+def get_lookup_related_fields(serializer):
+    """
+    Returns (field_name, field) pairs for writable fields resolved through a
+    LookupRelatedField, either directly or as the child of a many field.
+    """
+    result = []
+
+    for field_name, field in serializer.fields.items():
+        if field.read_only:
+            continue
+
+        if isinstance(field, relations.ManyRelatedField):
+            field = field.child_relation
+
+        if isinstance(field, LookupRelatedField):
+            result.append((field_name, field))
+
+    return result
+
+
 def get_dependencies(serializer):
     """
     Returns a list of related models that a serializer is dependent on.
@@ -54,17 +84,92 @@ def get_dependencies(serializer):
     return result
 
 
-def get_original_representation(serializer):
-    if serializer.instance:
+def has_unique_validators(serializer):
+    """
+    Returns whether a serializer or its fields validate uniqueness against
+    the database, which depends on the rows saved before.
+    """
+    unique_validators = (
+        UniqueValidator,
+        UniqueTogetherValidator,
+        BaseUniqueForValidator,
+    )
+    validators = list(serializer.validators)
+    for field in serializer.fields.values():
+        validators.extend(field.validators)
+
+    return any(isinstance(validator, unique_validators) for validator in validators)
+
+
+def can_bulk_save(serializer):
+    """
+    Returns whether saving a serializer is equivalent to setting its
+    validated data on a model instance, so the write can be done in bulk.
+    Bulk writes do not call the model's save() or send the pre_save and
+    post_save signals, so models that rely on them are saved one at a time.
+    """
+    if not isinstance(serializer, ModelSerializer):
+        return False
+
+    model = serializer.Meta.model
+    if model.save is not Model.save:
+        return False
+
+    if pre_save.has_listeners(model) or post_save.has_listeners(model):
+        return False
+
+    serializer_class = type(serializer)
+    if (
+        serializer_class.create is not ModelSerializer.create
+        or serializer_class.update is not ModelSerializer.update
+    ):
+        return False
+
+    if model._meta.parents:
+        return False
+
+    for field in serializer.fields.values():
+        if field.read_only:
+            continue
+
+        if isinstance(field, (relations.ManyRelatedField, BaseSerializer)):
+            return False
+
+        # Sources such as properties are not written by bulk_update
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return False
+
+        if not model_field.concrete or model_field.many_to_many:
+            return False
+
+    return True
+
+
+def get_original_representation(serializer, cache=None):
+    """
+    Returns the representation of the serializer's instance. If a cache dict
+    is given, the representation is computed once per serializer class and
+    instance, until the cache is cleared.
+    """
+    if not serializer.instance:
+        return {}
+
+    if cache is None:
         return serializer.to_representation(serializer.instance)
-    return {}
+
+    key = (type(serializer), id(serializer.instance))
+    if key not in cache:
+        cache[key] = serializer.to_representation(serializer.instance)
+    return cache[key]
 
 
-def get_changed_fields(serializer, validated_data=None):
+def get_changed_fields(serializer, validated_data=None, cache=None):
     validated_data = validated_data or serializer.validated_data
     result = {}
 
-    orig = get_original_representation(serializer)
+    orig = get_original_representation(serializer, cache)
 
     for field_name, field in serializer.fields.items():
         if field.read_only or field.write_only:
@@ -90,11 +195,11 @@ def get_changed_fields(serializer, validated_data=None):
     return result
 
 
-def has_changes(serializer, validated_data=None):
-    return bool(get_changed_fields(serializer, validated_data))
+def has_changes(serializer, validated_data=None, cache=None):
+    return bool(get_changed_fields(serializer, validated_data, cache))
 
 
-def might_have_changes(serializer):
+def might_have_changes(serializer, cache=None):
     submitted_fields = [
         (field_name, field)
         for field_name, field in serializer.fields.items()
@@ -103,7 +208,7 @@ def might_have_changes(serializer):
         and not field.write_only
     ]
 
-    orig_rep = get_original_representation(serializer)
+    orig_rep = get_original_representation(serializer, cache)
 
     old_values = {
         field_name: (
@@ -124,15 +229,15 @@ def might_have_changes(serializer):
     return old_values != new_values
 
 
-def get_diff_data(serializer, no_changes=None):
+def get_diff_data(serializer, no_changes=None, cache=None):
     data = {}
 
     changed_fields = {}
     orig = {}
 
     if not no_changes:
-        changed_fields = get_changed_fields(serializer)
-        orig = get_original_representation(serializer)
+        changed_fields = get_changed_fields(serializer, cache=cache)
+        orig = get_original_representation(serializer, cache)
 
     for column_name, value in serializer.initial_data.items():
         field = serializer.fields.get(column_name, None)
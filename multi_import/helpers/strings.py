@@ -5,7 +5,8 @@ windows_line_ending = re.compile("\r\n?")
 
 def normalize_string(s):
     value = s.strip()
-    value = windows_line_ending.sub("\n", value)
+    if "\r" in value:
+        value = windows_line_ending.sub("\n", value)
     return value
 
 
@@ -10,7 +10,14 @@ def transaction(function):
         commit = kwargs.pop("commit", True)
         trans = kwargs.pop("transaction", True)
 
-        if not trans:
+        # Nothing is saved in a dry run, anything else is rolled back
+        dry_run = kwargs.get("dry_run", False)
+        if dry_run:
+            commit = False
+
+        # Dry runs may save rows to validate them, so they are always rolled
+        # back, to a savepoint when already in a transaction
+        if not trans and not dry_run:
             return function(*args, **kwargs)
 
         result = None
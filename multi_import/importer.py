@@ -1,108 +1,330 @@
-from itertools import chain
-
-from django.core.exceptions import MultipleObjectsReturned, ValidationError
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from itertools import chain, islice
+
+from django.core.exceptions import (
+    FieldDoesNotExist,
+    MultipleObjectsReturned,
+    ValidationError,
+)
+from django.db import connections, router
+from django.db import transaction as db_transaction
 from django.utils.translation import gettext_lazy as _
+from rest_framework import relations
 from rest_framework.serializers import Serializer
 from tablib import Dataset
 
-from multi_import.cache import CachedQuery, ObjectCache
-from multi_import.data import ExportResult, ImportResult, Row, RowStatus
+from multi_import import checkpoints
+from multi_import.cache import CachedQuery, ObjectCache, RelatedLookupCache, chunked
+from multi_import.data import (
+    ExportResult,
+    ImportResult,
+    Row,
+    RowDiff,
+    RowStatus,
+    RowValues,
+    get_column_index,
+)
 from multi_import.exceptions import InvalidFileError
-from multi_import.formats import all_formats
+from multi_import.formats import DatasetStream, all_formats
 from multi_import.helpers import fields, files, serializers, strings
 from multi_import.helpers.exceptions import get_errors
 from multi_import.helpers.transactions import transaction
+from multi_import.metrics import ImportMetrics, QueryCounter
+from multi_import.progress import ImportProgress
 
 
 class RowData(object):
+    __slots__ = ("diff", "instance", "serializers", "representations", "validation")
+
     def __init__(self):
-        self.diff = {}
+        self.diff = RowDiff()
         self.instance = None
         self.serializers = []
+        self.representations = {}
+        self.validation = None
 
     def add_diff(self, diff):
-        self.diff.update(**diff)
+        self.diff.update(diff)
+
+
+Column = namedtuple("Column", ["index", "name", "field", "converter", "source"])
+
+Validation = namedtuple(
+    "Validation", ["serializer", "might_have_changes", "is_valid", "has_changes"]
+)
+
+
+class BulkWriter(object):
+    """
+    Accumulates the instances of validated serializers, and writes them
+    in batches with bulk_create and bulk_update instead of saving each.
+    """
+
+    def __init__(self, model, batch_size=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.to_create = []
+        self.to_update = []
+        self.update_fields = set()
+
+    def __len__(self):
+        return len(self.to_create) + len(self.to_update)
+
+    def save(self, serializer, representations=None):
+        validated_data = serializer.validated_data
+        instance = serializer.instance
+
+        if instance is None:
+            instance = self.model(**validated_data)
+            self.to_create.append(instance)
+        else:
+            changed_fields = serializers.get_changed_fields(
+                serializer, cache=representations
+            )
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            self.to_update.append(instance)
+            self.update_fields.update(
+                change.field.source for change in changed_fields.values()
+            )
+
+        serializer.instance = instance
+        return instance
+
+    def flush(self):
+        """
+        Writes the pending instances, and returns the ones that were created.
+        """
+        created = self.to_create
+        manager = self.model._default_manager
+
+        if created:
+            manager.bulk_create(created, batch_size=self.batch_size)
+
+        if self.to_update and self.update_fields:
+            update_fields = set(self.update_fields)
+            for field in self.model._meta.concrete_fields:
+                if getattr(field, "auto_now", False):
+                    update_fields.add(field.name)
+                    for instance in self.to_update:
+                        field.pre_save(instance, False)
+
+            manager.bulk_update(
+                self.to_update, update_fields, batch_size=self.batch_size
+            )
+
+        self.to_create = []
+        self.to_update = []
+        self.update_fields = set()
+        return created
+
+
+class DryRunWriter(BulkWriter):
+    """
+    Applies the validated data of serializers to instances in memory,
+    without writing them. New instances are placeholders without a pk.
+    """
+
+    def __len__(self):
+        return 0
+
+    def save(self, serializer, representations=None):
+        instance = serializer.instance
+        if instance is None:
+            instance = self.model()
+
+        for attr, value in serializer.validated_data.items():
+            if self.is_assignable(attr):
+                setattr(instance, attr, value)
+
+        serializer.instance = instance
+        return instance
+
+    def flush(self):
+        return []
+
+    def is_assignable(self, attr):
+        try:
+            field = self.model._meta.get_field(attr)
+        except FieldDoesNotExist:
+            return False
+
+        # Many to many values can not be set before an instance is saved
+        return field.concrete and not field.many_to_many
 
 
 class Rows(object):
     def __init__(self, headers, rows=None):
         self.headers = headers
         self.rows = [(row, RowData()) for row in rows or []]
+        # False when the post save validators of some rows were not run
+        self.post_save_validated = True
 
     def __iter__(self):
         for row in self.rows:
             yield row
 
 
+class ExportStream(DatasetStream):
+    """
+    Exported rows, produced from the queryset in chunks each time the
+    stream is iterated rather than held in memory.
+    """
+
+    def __init__(self, headers, queryset, get_row, chunk_size):
+        self.headers = headers
+        self.queryset = queryset
+        self.get_row = get_row
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for instance in self.queryset.iterator(chunk_size=self.chunk_size):
+            yield self.get_row(instance)
+
+
 class DataReader(object):
     def __init__(self, serializers):
         self.serializers = serializers
 
     def read(self, data):
-        if isinstance(data, Dataset):
+        if isinstance(data, (Dataset, DatasetStream)):
             return self.read_dataset(data)
         return Rows(headers=data.headers, rows=data.rows)
 
     def read_dataset(self, dataset):
-        rows = self.read_dataset_rows(dataset)
-        return Rows(headers=dataset.headers, rows=self.enumerate_data(rows))
+        return Rows(headers=dataset.headers, rows=self.enumerate_dataset(dataset))
+
+    def read_chunks(self, data, size, after_row_number=None):
+        """
+        Reads the rows lazily, as Rows of up to size rows each. Rows up to
+        after_row_number are skipped.
+        """
+        if isinstance(data, (Dataset, DatasetStream)):
+            rows = self.enumerate_dataset(data)
+        else:
+            rows = iter(data.rows)
+
+        if after_row_number is not None:
+            rows = (row for row in rows if row.row_number > after_row_number)
+
+        while True:
+            chunk = list(islice(rows, size))
+            if not chunk:
+                break
+            yield Rows(headers=data.headers, rows=chunk)
+
+    def enumerate_dataset(self, dataset):
+        """
+        Enumerates the rows of a dataset, with their values aligned to its
+        headers.
+        """
+        columns = get_column_index(dataset.headers)
+        rows = self.enumerate_values(self.read_dataset_values(dataset))
+        for row_number, line_number, values in rows:
+            yield Row(row_number, line_number, RowValues(columns, values))
 
     def enumerate_data(self, data):
         """
         Enumerates rows, and calculates row and line numbers
         """
+        rows = self.enumerate_values(data, get_values=dict.values)
+        for row_number, line_number, row_data in rows:
+            yield Row(row_number, line_number, row_data)
+
+    def enumerate_values(self, data, get_values=None):
         first_row_line_number = 2
         line_count = 0
 
-        for row_number, row_data in enumerate(data, start=2):
+        for row_number, item in enumerate(data, start=2):
+            values = get_values(item) if get_values else item
+
             # Skip empty rows
-            if not self.has_values(row_data):
+            if not self.has_values(values):
                 continue
 
             line_number = first_row_line_number + line_count
-            line_count += 1 + sum([value.count("\n") for value in row_data.values()])
+            line_count += 1 + sum([value.count("\n") for value in values])
 
-            yield Row(row_number, line_number, row_data)
+            yield row_number, line_number, item
 
-    def has_values(self, row_data):
+    def has_values(self, values):
         return any(
             value
-            for value in row_data.values()
+            for value in values
             if value and (not isinstance(value, str) or not value.isspace())
         )
 
+    def get_column_plan(self, headers):
+        """
+        Resolves the serializer field and string converter of every column
+        once per dataset. Later serializers take precedence over earlier ones.
+        """
+        column_fields = {}
+        for serializer in self.serializers:
+            column_fields.update(serializer.fields)
+
+        plan = []
+        for index, name in enumerate(headers):
+            field = column_fields.get(name, None)
+            plan.append(
+                Column(
+                    index=index,
+                    name=name,
+                    field=field,
+                    converter=(
+                        fields.get_from_string_converter(field) if field else None
+                    ),
+                    source=field.source if field else None,
+                )
+            )
+        return plan
+
     def read_dataset_rows(self, dataset):
-        serializers = self.serializers
-        for row_data in dataset.dict:
-            data = self.normalize_row_data(row_data)
-
-            result = data.copy()
-            for field_name, value in data.items():
-                for serializer in serializers:
-                    field = serializer.fields.get(field_name, None)
-                    if field:
-                        val = fields.from_string_representation(field, value)
-                        result[field_name] = val
-            yield result
+        headers = dataset.headers
+        for values in self.read_dataset_values(dataset):
+            yield dict(zip(headers, values))
+
+    def read_dataset_values(self, dataset):
+        """
+        Yields the normalized and converted values of each row, as tuples
+        aligned to the headers of the dataset.
+        """
+        converters = [
+            column.converter for column in self.get_column_plan(dataset.headers)
+        ]
+        normalize_value = self.normalize_value
+
+        for values in dataset:
+            yield tuple(
+                (
+                    converter(normalize_value(value))
+                    if converter
+                    else normalize_value(value)
+                )
+                for value, converter in zip(values, converters)
+            )
 
     def normalize_row_data(self, row_data):
         """
         Converts all values in row_data dict to strings.
         Required for Excel imports.
         """
-        data = {}
-        for key, value in row_data.items():
-            if value is None:
-                value = ""
+        return {key: self.normalize_value(value) for key, value in row_data.items()}
 
-            if isinstance(value, float) and value.is_integer():
-                value = int(value)
+    def normalize_value(self, value):
+        if value is None:
+            return ""
 
-            if not isinstance(value, str):
-                value = str(value)
+        if isinstance(value, str):
+            return strings.normalize_string(value)
 
-            data[key] = strings.normalize_string(value)
-        return data
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+
+        return strings.normalize_string(str(value))
 
 
 class PostSaveValidator(Serializer):
@@ -140,8 +362,40 @@ class Importer(object):
     lookup_fields = ("pk",)
     file_formats = all_formats
     export_filename = None
+    # Instances fetched per query when exporting as a stream
+    export_chunk_size = 2000
+    # When enabled, files in a streamable format are parsed while importing
+    stream_files = False
 
     cached_query = CachedQuery
+    # When enabled, only instances referenced by the imported rows are loaded
+    scope_cached_query = False
+    # When enabled, LookupRelatedField values are resolved in bulk per step.
+    # Lookups then see the database as it was at the start of the step, so
+    # rows can not refer to values changed by previous rows of the step.
+    resolve_related_lookups = False
+    related_lookup_cache = RelatedLookupCache
+    # When enabled, rows are written with bulk_create / bulk_update, unless
+    # the model overrides save() or has pre_save / post_save receivers
+    bulk_save = False
+    bulk_batch_size = 500
+    # When set, rows are imported this many at a time, each chunk in a
+    # savepoint, keeping only the results of the rows of previous chunks
+    import_chunk_size = None
+    # When set, with import_chunk_size, a checkpoint is stored with each
+    # committed chunk, and an interrupted import resumes after it. Chunks
+    # may be imported again when resuming, at least once, but their new
+    # objects are only created once, see restore_checkpoint()
+    checkpoint_store = None
+    # When set, the rows of serializers with Meta.parallel_validation are
+    # validated in this many threads before they are saved in order
+    validation_workers = None
+    # When set, called with a ProgressEvent as the phases of an import
+    # start and end, and with the rows processed at most once per interval
+    progress_callback = None
+    progress_interval = 1.0
+    # When enabled, results have the wall time and query count of each phase
+    collect_metrics = False
     serializer = None  # Deprecated in favour of serializer_class
     serializer_class = None
     serializer_classes = None
@@ -153,9 +407,16 @@ class Importer(object):
     }
 
     def __init__(self):
+        self.progress = None
+        self.metrics = None
         self.empty_serializers = [
             serializer() for serializer in self.get_serializer_classes()
         ]
+        # The sources of each column, in every serializer that has it
+        self.lookup_sources = {}
+        for serializer in self.empty_serializers:
+            for field_name, field in serializer.fields.items():
+                self.lookup_sources.setdefault(field_name, []).append(field.source)
 
     def get_serializer_classes(self):
         serializer = self.serializer_class or self.serializer
@@ -173,7 +434,7 @@ class Importer(object):
         return serializers.get_dependencies(self.empty_serializers[0])
 
     def get_queryset(self):
-        queryset = self.model.objects
+        queryset = self.model.objects.all()
 
         for serializer in self.empty_serializers:
             for field in serializers.get_related_fields(serializer):
@@ -190,17 +451,27 @@ class Importer(object):
     def get_import_queryset(self):
         return self.get_queryset()
 
-    def export(self, empty=False, context=None):
+    def export(self, empty=False, context=None, stream=False):
         serializer_context = self.get_export_serializer_context(context)
         serializers = [
             serializer_class(context=serializer_context)
             for serializer_class in self.get_serializer_classes()
         ]
-        dataset = Dataset(headers=self.get_export_header(serializers))
-
-        if not empty:
-            for instance in self.get_export_queryset():
-                dataset.append(self.get_export_row(serializers, instance))
+        headers = self.get_export_header(serializers)
+
+        if stream:
+            queryset = self.get_export_queryset()
+            dataset = ExportStream(
+                headers=headers,
+                queryset=queryset.none() if empty else queryset,
+                get_row=partial(self.get_export_row, serializers),
+                chunk_size=self.export_chunk_size,
+            )
+        else:
+            dataset = Dataset(headers=headers)
+            if not empty:
+                for instance in self.get_export_queryset():
+                    dataset.append(self.get_export_row(serializers, instance))
 
         return ExportResult(
             dataset=dataset,
@@ -247,6 +518,11 @@ class Importer(object):
         if self.model not in context["model_contexts"]:
             context["model_contexts"][self.model] = self.get_model_context()
 
+        # Models written by the import, shared by the importers of a
+        # MultiImporter, until they are committed
+        if "written_models" not in context:
+            context["written_models"] = set()
+
         context["cached_query"] = self.get_cached_query()
 
         return context
@@ -261,40 +537,256 @@ class Importer(object):
         return self.cached_query(self.get_import_queryset(), self.lookup_fields)
 
     @transaction
-    def import_file(self, file, context=None):
+    def import_file(self, file, context=None, dry_run=False):
         try:
-            dataset = files.read(self.file_formats, file)
+            dataset = files.read(self.file_formats, file, stream=self.stream_files)
         except InvalidFileError as e:
             return ImportResult(key=self.key, error=str(e))
 
-        return self.import_data(dataset, context=context, transaction=False)
+        fingerprint = None
+        if self.checkpoint_store is not None:
+            fingerprint = checkpoints.fingerprint_file(file)
+
+        return self.import_data(
+            dataset,
+            context=context,
+            dry_run=dry_run,
+            fingerprint=fingerprint,
+            transaction=False,
+        )
 
     @transaction
-    def import_data(self, data, context=None):
+    def import_data(self, data, context=None, dry_run=False, fingerprint=None):
         serializer_context = self.get_import_serializer_context(context)
+        serializer_context["dry_run"] = dry_run
+        self.progress = self.get_progress()
+
+        if not self.collect_metrics:
+            self.metrics = None
+            return self.process_data(data, serializer_context, dry_run, fingerprint)
+
+        query_counter = QueryCounter()
+        self.metrics = ImportMetrics(query_counter)
+        with query_counter.install():
+            result = self.process_data(data, serializer_context, dry_run, fingerprint)
+        result.metrics = self.metrics
+        return result
 
-        rows = self.read_rows(data)
+    def process_data(self, data, context, dry_run=False, fingerprint=None):
+        if self.import_chunk_size:
+            if self.checkpoint_store is None or dry_run:
+                fingerprint = None
+            elif fingerprint is None and isinstance(data, Dataset):
+                fingerprint = checkpoints.fingerprint_dataset(data)
 
-        self.load_instances(rows, serializer_context)
+            return self.import_chunks(data, context, dry_run, fingerprint)
+
+        try:
+            with self.measure("read_rows"):
+                rows = self.read_rows(data)
+        except InvalidFileError as e:
+            return ImportResult(key=self.key, error=str(e))
+
+        self.import_rows(rows, context, dry_run)
+
+        return self.transform_rows_to_result(rows)
+
+    def import_chunks(self, data, context, dry_run=False, fingerprint=None):
+        """
+        Imports the rows in chunks of import_chunk_size, each in a savepoint.
+        Once a chunk is imported only its rows are kept, and their
+        serializers and instances are released. Every step runs for a chunk
+        before the next one, so rows can only refer to new objects of the
+        same or previous chunks.
+
+        Without an outer transaction, each chunk is committed separately.
+        Given the fingerprint of the data, a checkpoint is stored after each
+        committed chunk. When resuming from a checkpoint, the result only
+        has the rows after it.
+        """
+        data_reader = DataReader(self.empty_serializers)
+        results = []
+        post_save_validated = True
+
+        after_row_number = None
+        if fingerprint:
+            after_row_number = self.restore_checkpoint(fingerprint, context)
+
+        chunks = data_reader.read_chunks(data, self.import_chunk_size, after_row_number)
+        phase = self.progress.start("import_chunks") if self.progress else None
+
+        try:
+            while True:
+                with self.measure("read_rows"):
+                    rows = next(chunks, None)
+                if rows is None:
+                    break
+
+                # Chunks are only committed outside of a transaction
+                commits = not db_transaction.get_connection().in_atomic_block
+
+                with db_transaction.atomic():
+                    self.import_rows(rows, context, dry_run)
+                    # Stored before the chunk commits, so a chunk is never
+                    # committed without its checkpoint
+                    if fingerprint and commits:
+                        self.save_checkpoint(fingerprint, rows)
+                results.extend(row for row, _data in rows)
+                post_save_validated = post_save_validated and rows.post_save_validated
+
+                if phase is not None:
+                    phase.advance(len(rows.rows))
+
+                if commits:
+                    context["written_models"].clear()
+        except InvalidFileError as e:
+            return ImportResult(key=self.key, error=str(e))
+
+        if fingerprint:
+            self.checkpoint_store.delete(self.get_checkpoint_key(fingerprint))
+
+        if phase is not None:
+            self.progress.end(phase)
+
+        return ImportResult(
+            key=self.key,
+            headers=data.headers,
+            rows=results,
+            post_save_validated=post_save_validated,
+        )
+
+    def get_checkpoint_key(self, fingerprint):
+        return "{0}:{1}".format(self.key, fingerprint)
+
+    def save_checkpoint(self, fingerprint, rows):
+        """
+        Stores the progress of a chunk about to be committed: its last row
+        number, the pks of the instances its rows loaded, and of the new
+        objects.
+        """
+        loaded_pks = []
+        new_objects = []
+        for row, data in rows:
+            if row.status == RowStatus.new:
+                new_objects.append(data.instance.pk)
+            elif data.instance is not None:
+                loaded_pks.append(data.instance.pk)
+
+        self.checkpoint_store.append(
+            self.get_checkpoint_key(fingerprint),
+            {
+                "version": checkpoints.version,
+                "fingerprint": fingerprint,
+                "row_number": rows.rows[-1][0].row_number,
+                "loaded_pks": loaded_pks,
+                "new_objects": new_objects,
+            },
+        )
+
+    def restore_checkpoint(self, fingerprint, context):
+        """
+        Restores the loaded pks and new objects of a previous import into
+        the model context, and returns the last row number it committed.
+
+        Checkpoints are stored before their chunk commits, so records whose
+        new objects do not exist, of chunks that were rolled back, are
+        discarded. Whether the last chunk committed is not known when it
+        has no new objects, so its rows are imported again, which only
+        updates instances to the same values.
+        """
+        records = [
+            record
+            for record in self.checkpoint_store.load(
+                self.get_checkpoint_key(fingerprint)
+            )
+            if record.get("version") == checkpoints.version
+            and record.get("fingerprint") == fingerprint
+        ]
+        to_python = self.model._meta.pk.to_python
+        new_object_pks = [
+            to_python(pk) for record in records for pk in record["new_objects"]
+        ]
+        new_objects = {}
+        manager = self.model._default_manager
+        for pks in chunked(new_object_pks, self.bulk_batch_size):
+            for instance in manager.filter(pk__in=pks):
+                new_objects[instance.pk] = instance
+
+        records = [
+            record
+            for record in records
+            if all(to_python(pk) in new_objects for pk in record["new_objects"])
+        ]
+        if records and not records[-1]["new_objects"]:
+            records.pop()
+        if not records:
+            return None
+
+        model_context = context["model_contexts"][self.model]
+        model_context["loaded_pks"].update(
+            to_python(pk) for record in records for pk in record["loaded_pks"]
+        )
+        for instance in new_objects.values():
+            self.cache_instance(context, instance)
+
+        return max(record["row_number"] for record in records)
+
+    def import_rows(self, rows, context, dry_run=False):
+        with self.measure("load_instances"):
+            self.load_instances(rows, context)
 
         steps = len(self.get_serializer_classes())
 
         for step in range(steps):
-            self.process_rows(rows, serializer_context, step)
+            with self.measure("process_rows", step):
+                self.process_rows(rows, context, step)
 
-        self.validate_rows_post_save(rows)
+        with self.measure("validate_rows_post_save"):
+            self.validate_rows_post_save(rows, dry_run)
 
-        self.process_diffs(rows)
+        with self.measure("process_diffs"):
+            self.process_diffs(rows)
 
-        return self.transform_rows_to_result(rows)
+    def measure(self, phase, step=None):
+        if self.metrics is None:
+            return nullcontext()
+        return self.metrics.phase(phase, step)
 
     def read_rows(self, data):
+        phase = self.progress.start("read_rows") if self.progress else None
+
         data_reader = DataReader(self.empty_serializers)
         rows = data_reader.read(data)
+
+        if phase is not None:
+            phase.advance(len(rows.rows))
+            self.progress.end(phase)
         return rows
 
+    def get_progress(self, callback=None):
+        callback = callback or self.progress_callback
+        if callback is None:
+            return None
+        return ImportProgress(callback, self.key, self.progress_interval)
+
+    def track_rows(self, rows, phase, step=None, total=None):
+        """
+        Counts the rows processed in a phase, when reporting progress.
+        """
+        if self.progress is None:
+            return rows
+
+        if total is None and isinstance(rows, Rows):
+            total = len(rows.rows)
+        return self.progress.track(rows, phase, step, total)
+
     def load_instances(self, rows, context):
-        for row, data in rows:
+        if self.scope_cached_query:
+            context["cached_query"].scope(
+                self.get_lookup_data(row) for row, data in rows
+            )
+
+        for row, data in self.track_rows(rows, "load_instances"):
             self.load_instance(row, data, context)
 
     def process_rows(self, rows, context, step_index):
@@ -304,6 +796,13 @@ class Importer(object):
             return
 
         serializer_class = serializer_classes[step_index]
+
+        if self.resolve_related_lookups:
+            self.load_related_lookups(rows, context, serializer_class)
+
+        if self.can_validate_rows_in_parallel(serializer_class, context):
+            self.validate_rows(rows, context, serializer_class, step_index)
+
         process_row = (
             self.process_row_first_pass
             if step_index == 0
@@ -319,22 +818,216 @@ class Importer(object):
             else:
                 rows_to_add.append((row, data))
 
+        bulk_writer = None
+        if context.get("dry_run"):
+            bulk_writer = self.get_dry_run_writer(serializer_class, context)
+        elif self.bulk_save:
+            bulk_writer = self.get_bulk_writer(serializer_class, context)
+        context["bulk_writer"] = bulk_writer
+
         # Process updates first, then create new objects
-        for row, data in chain(rows_to_update, rows_to_add):
+        ordered_rows = self.track_rows(
+            chain(rows_to_update, rows_to_add),
+            "process_rows",
+            step=step_index,
+            total=len(rows_to_update) + len(rows_to_add),
+        )
+        for row, data in ordered_rows:
             process_row(row, data, context, serializer_class)
 
-    def validate_rows_post_save(self, rows):
-        for row, data in rows:
+            if bulk_writer is not None and len(bulk_writer) >= self.bulk_batch_size:
+                self.flush_bulk_writer(context)
+
+        if bulk_writer is not None:
+            self.flush_bulk_writer(context)
+        del context["bulk_writer"]
+
+    def can_validate_rows_in_parallel(self, serializer_class, context):
+        """
+        Rows are validated in parallel if the serializer declares that its
+        validation does not write to the database, nor read what previous
+        rows wrote, with Meta.parallel_validation. Uniqueness validators
+        read the rows saved before, so their rows are validated in order.
+        The connections of the threads do not see uncommitted rows, so rows
+        are only validated in parallel before the import writes any.
+        """
+        meta = getattr(serializer_class, "Meta", None)
+        if not self.validation_workers or not getattr(
+            meta, "parallel_validation", False
+        ):
+            return False
+
+        if context.get("written_models"):
+            return False
+
+        serializer = serializer_class(context=context)
+        if serializers.has_unique_validators(serializer):
+            return False
+
+        # Rows may refer to new objects created by previous rows
+        return self.model not in serializers.get_dependencies(serializer)
+
+    def validate_rows(self, rows, context, serializer_class, step_index):
+        """
+        Validates the rows of a step in a pool of threads, ahead of saving
+        them. Each thread uses its own database connections, whose queries
+        are added to the metrics.
+        """
+        rows_to_validate = [
+            (row, data)
+            for row, data in rows
+            if step_index == 0 or (not row.errors and data.instance)
+        ]
+        if not rows_to_validate:
+            return
+
+        def validate(chunk):
+            query_counter = QueryCounter()
+            try:
+                with query_counter.install():
+                    for row, data in chunk:
+                        data.validation = self.validate_row(
+                            row, data, context, serializer_class
+                        )
+            finally:
+                connections.close_all()
+            return query_counter.count
+
+        workers = self.validation_workers
+        chunk_size = -(-len(rows_to_validate) // workers)
+        with ThreadPoolExecutor(workers) as executor:
+            counts = list(executor.map(validate, chunked(rows_to_validate, chunk_size)))
+
+        if self.metrics is not None:
+            self.metrics.query_counter.count += sum(counts)
+
+    def validate_row(self, row, data, context, serializer_class):
+        serializer = serializer_class(
+            instance=data.instance,
+            data=row.data.copy(),
+            context=context,
+            partial=data.instance is not None,
+        )
+
+        if not serializers.might_have_changes(serializer, data.representations):
+            return Validation(serializer, False, None, False)
+
+        is_valid = serializer.is_valid()
+        has_changes = is_valid and serializers.has_changes(
+            serializer, cache=data.representations
+        )
+        return Validation(serializer, True, is_valid, has_changes)
+
+    def get_bulk_writer(self, serializer_class, context):
+        """
+        Returns a BulkWriter for the serializer class, or None if its rows
+        have to be saved one at a time.
+        """
+        serializer = serializer_class(context=context)
+
+        if not serializers.can_bulk_save(serializer):
+            return None
+
+        # Uniqueness validators only see the rows written before
+        if serializers.has_unique_validators(serializer):
+            return None
+
+        # Rows may refer to new objects created by previous rows
+        if self.model in serializers.get_dependencies(serializer):
+            return None
+
+        model = serializer.Meta.model
+        connection = connections[router.db_for_write(model)]
+        if not connection.features.can_return_rows_from_bulk_insert:
+            return None
+
+        return BulkWriter(model, self.bulk_batch_size)
+
+    def get_dry_run_writer(self, serializer_class, context):
+        """
+        Returns a DryRunWriter for the serializer class, or None if its rows
+        have to be saved, to be rolled back with the dry run's transaction.
+        """
+        # Uniqueness validators only see the rows written before
+        if serializers.has_unique_validators(serializer_class(context=context)):
+            return None
+
+        meta = getattr(serializer_class, "Meta", None)
+        return DryRunWriter(getattr(meta, "model", self.model))
+
+    def flush_bulk_writer(self, context):
+        for instance in context["bulk_writer"].flush():
+            self.cache_instance(context, instance)
+
+    def save_serializer(self, serializer, context, representations=None):
+        bulk_writer = context.get("bulk_writer")
+        if bulk_writer is not None:
+            instance = bulk_writer.save(serializer, representations)
+        else:
+            instance = serializer.save()
+
+        if not isinstance(bulk_writer, DryRunWriter):
+            context.setdefault("written_models", set()).add(type(instance))
+
+        # Cached representations are stale once the instance has changed
+        if representations is not None:
+            representations.clear()
+        return instance
+
+    def load_related_lookups(self, rows, context, serializer_class):
+        """
+        Resolves the values of every LookupRelatedField column ahead of
+        processing the rows, so that each cell does not query separately.
+        Values are resolved again for each step and chunk, as previous ones
+        may have changed them. Fields with their own get_queryset() are
+        queried per cell.
+        """
+        serializer = serializer_class(context=context)
+        related_lookups = context["related_lookups"] = {}
+
+        for field_name, field in serializers.get_lookup_related_fields(serializer):
+            if type(field).get_queryset is not relations.RelatedField.get_queryset:
+                continue
+
+            values = set()
+            for row, _data in rows:
+                value = row.data.get(field_name, None)
+                if isinstance(value, list):
+                    values.update(value)
+                elif value:
+                    values.add(value)
+
+            cache = self.related_lookup_cache(field.get_queryset(), field.lookup_fields)
+            cache.resolve(values)
+            related_lookups[(serializer_class, field_name)] = cache
+
+    def validate_rows_post_save(self, rows, dry_run=False):
+        """
+        In a dry run, updated rows are validated against their instances
+        in memory. New rows that were not saved only have placeholder
+        instances, so their post create validators are not run, and the
+        rows are marked as not post save validated.
+        """
+        for row, data in self.track_rows(rows, "validate_rows_post_save"):
+            if dry_run and row.status == RowStatus.new and data.instance.pk is None:
+                validator = PostSaveValidator(row=row, serializers=data.serializers)
+                if validator.get_validators():
+                    rows.post_save_validated = False
+                continue
+
             self.validate_row_post_save(row, data)
 
     def process_diffs(self, rows):
-        for row, data in rows:
+        for row, data in self.track_rows(rows, "process_diffs"):
             if row.status == RowStatus.new or row.status == RowStatus.update:
                 row.diff = data.diff
 
     def transform_rows_to_result(self, rows):
         return ImportResult(
-            key=self.key, headers=rows.headers, rows=[row for row, data in rows.rows]
+            key=self.key,
+            headers=rows.headers,
+            rows=[row for row, data in rows.rows],
+            post_save_validated=rows.post_save_validated,
         )
 
     def enumerate_data(self, data):
@@ -370,35 +1063,30 @@ class Importer(object):
             data.instance = instance
 
     def get_lookup_data(self, row):
-        serializers = self.empty_serializers
+        lookup_sources = self.lookup_sources
         data = {}
         for key, value in row.data.items():
-            for serializer in serializers:
-                field = serializer.fields.get(key, None)
-                if field:
-                    data[field.source] = value
+            for source in lookup_sources.get(key, ()):
+                data[source] = value
         return data
 
     def lookup_model_object(self, cached_query, lookup_data):
         return cached_query.match(lookup_data, self.lookup_fields)
 
     def process_row_first_pass(self, row, data, context, serializer_class):
-        serializer = serializer_class(
-            instance=data.instance,
-            data=row.data.copy(),
-            context=context,
-            partial=data.instance is not None,
+        validation = data.validation or self.validate_row(
+            row, data, context, serializer_class
         )
+        data.validation = None
+        serializer = validation.serializer
 
-        does_not_have_changes = not serializers.might_have_changes(serializer)
-
-        if does_not_have_changes:
+        if not validation.might_have_changes:
             row.status = RowStatus.unchanged
             data.add_diff(serializers.get_diff_data(serializer, no_changes=True))
             return
 
-        is_valid = serializer.is_valid()
-        has_changes = serializers.has_changes(serializer)
+        is_valid = validation.is_valid
+        has_changes = validation.has_changes
 
         cannot_update = (
             data.instance
@@ -421,13 +1109,19 @@ class Importer(object):
 
         try:
             creating = not data.instance
-            data.add_diff(serializers.get_diff_data(serializer))
-            data.instance = serializer.save()
+            data.add_diff(
+                serializers.get_diff_data(serializer, cache=data.representations)
+            )
+            data.instance = self.save_serializer(
+                serializer, context, data.representations
+            )
             data.serializers.append(serializer)
 
             if creating:
                 row.status = RowStatus.new
-                self.cache_instance(context, data.instance)
+                # Bulk written instances are cached once they are created
+                if context.get("bulk_writer") is None or context.get("dry_run"):
+                    self.cache_instance(context, data.instance)
             else:
                 row.status = RowStatus.update
 
@@ -442,32 +1136,31 @@ class Importer(object):
         if not data.instance:
             return
 
-        serializer = serializer_class(
-            instance=data.instance,
-            data=row.data.copy(),
-            context=context,
-            partial=data.instance is not None,
+        validation = data.validation or self.validate_row(
+            row, data, context, serializer_class
         )
+        data.validation = None
+        serializer = validation.serializer
 
-        does_not_have_changes = not serializers.might_have_changes(serializer)
-
-        if does_not_have_changes:
+        if not validation.might_have_changes:
             data.add_diff(serializers.get_diff_data(serializer, no_changes=True))
             return
 
-        is_valid = serializer.is_valid()
-
-        if not is_valid:
+        if not validation.is_valid:
             row.set_errors(serializer.errors)
             return
 
-        if not serializers.has_changes(serializer):
+        if not validation.has_changes:
             data.add_diff(serializers.get_diff_data(serializer, no_changes=True))
             return
 
         try:
-            data.add_diff(serializers.get_diff_data(serializer))
-            data.instance = serializer.save()
+            data.add_diff(
+                serializers.get_diff_data(serializer, cache=data.representations)
+            )
+            data.instance = self.save_serializer(
+                serializer, context, data.representations
+            )
             data.serializers.append(serializer)
 
             if row.status == RowStatus.unchanged:
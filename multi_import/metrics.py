@@ -0,0 +1,206 @@
+import re
+import sys
+from collections import Counter, namedtuple
+from contextlib import ExitStack, contextmanager
+from time import perf_counter
+
+from django.db import connections
+
+PhaseMetrics = namedtuple("PhaseMetrics", ["phase", "step", "time", "queries"])
+RepeatedQuery = namedtuple("RepeatedQuery", ["sql", "call_site", "count"])
+
+# Modules whose frames are skipped when finding the call site of a query
+library_modules = ("django", "rest_framework", "contextlib", __name__)
+
+string_literal = re.compile(r"'(?:[^']|'')*'")
+number_literal = re.compile(r"\b\d+(?:\.\d+)?\b")
+placeholder_list = re.compile(r"\(\s*%s(?:\s*,\s*%s)*\s*\)")
+whitespace = re.compile(r"\s+")
+
+
+def normalize_sql(sql):
+    """
+    Returns a statement with its literals and lists of placeholders
+    replaced, so that queries differing only in parameters are grouped.
+    """
+    sql = string_literal.sub("%s", sql)
+    sql = number_literal.sub("%s", sql)
+    sql = placeholder_list.sub("(...)", sql)
+    return whitespace.sub(" ", sql).strip()
+
+
+def get_call_site(frame):
+    """
+    Returns the qualified name of the first function outside of Django and
+    Django REST framework that led to the frame.
+    """
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not any(
+            module == name or module.startswith(name + ".") for name in library_modules
+        ):
+            return "{0}.{1}".format(module, frame.f_code.co_qualname)
+        frame = frame.f_back
+    return None
+
+
+class QueryCounter(object):
+    """
+    Counts the SQL queries executed by the current thread while installed.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    @contextmanager
+    def install(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+
+class QueryLog(QueryCounter):
+    """
+    Groups the SQL queries executed while installed by normalized statement
+    and call site, to find queries that are repeated for each row.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        call_site = get_call_site(sys._getframe(1))
+        self.statements[(normalize_sql(sql), call_site)] += 1
+        return super().__call__(execute, sql, params, many, context)
+
+    def repeated(self, threshold=1):
+        """
+        Returns the statements executed more than threshold times from the
+        same call site, most frequent first.
+        """
+        return [
+            RepeatedQuery(sql=sql, call_site=call_site, count=count)
+            for (sql, call_site), count in self.statements.most_common()
+            if count > threshold
+        ]
+
+    def report(self, threshold=1):
+        return "\n".join(
+            "{0} queries from {1}: {2}".format(query.count, query.call_site, query.sql)
+            for query in self.repeated(threshold)
+        )
+
+    def assert_no_repeats(self, threshold):
+        """
+        Fails if any statement was executed more than threshold times from
+        the same call site.
+        """
+        if self.repeated(threshold):
+            raise AssertionError(
+                "Queries repeated more than {0} times:\n{1}".format(
+                    threshold, self.report(threshold)
+                )
+            )
+
+    def assert_budget(self, rows, queries_per_row, fixed=0):
+        """
+        Fails if more than queries_per_row queries per row, plus a fixed
+        number of queries, were executed.
+        """
+        budget = rows * queries_per_row + fixed
+        if self.count > budget:
+            raise AssertionError(
+                "{0} queries executed for {1} rows, the budget is {2}:\n{3}".format(
+                    self.count, rows, budget, self.report()
+                )
+            )
+
+
+class ImportMetrics(object):
+    """
+    The wall time and SQL query count of each phase of an import.
+    """
+
+    def __init__(self, query_counter):
+        self.query_counter = query_counter
+        self.phase_metrics = {}
+
+    @property
+    def phases(self):
+        return list(self.phase_metrics.values())
+
+    @property
+    def time(self):
+        return sum(phase.time for phase in self.phases)
+
+    @property
+    def queries(self):
+        return sum(phase.queries for phase in self.phases)
+
+    @contextmanager
+    def phase(self, name, step=None):
+        """
+        Measures a phase. Phases that run more than once, such as for each
+        chunk of rows, are added up.
+        """
+        started = perf_counter()
+        queries = self.query_counter.count
+        try:
+            yield
+        finally:
+            time = perf_counter() - started
+            queries = self.query_counter.count - queries
+
+            previous = self.phase_metrics.get((name, step))
+            if previous is not None:
+                time += previous.time
+                queries += previous.queries
+
+            self.phase_metrics[(name, step)] = PhaseMetrics(
+                phase=name, step=step, time=time, queries=queries
+            )
+
+    def to_json(self):
+        return {
+            "time": self.time,
+            "queries": self.queries,
+            "phases": [phase._asdict() for phase in self.phases],
+        }
+
+
+class MultiImportMetrics(object):
+    """
+    The wall time and SQL query count of a multi import, and the metrics
+    of each of its importers.
+    """
+
+    def __init__(self, query_counter):
+        self.query_counter = query_counter
+        self.importers = {}
+        self.time = None
+        self.queries = None
+
+    @contextmanager
+    def measure(self):
+        started = perf_counter()
+        queries = self.query_counter.count
+        try:
+            yield
+        finally:
+            self.time = perf_counter() - started
+            self.queries = self.query_counter.count - queries
+
+    def to_json(self):
+        return {
+            "time": self.time,
+            "queries": self.queries,
+            "importers": {
+                key: metrics.to_json() for key, metrics in self.importers.items()
+            },
+        }
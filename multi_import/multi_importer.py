@@ -1,3 +1,8 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.utils.translation import gettext_lazy as _
 
 from multi_import.data import MultiExportResult, MultiImportResult
@@ -5,6 +10,15 @@ from multi_import.exceptions import InvalidDatasetError, InvalidFileError
 from multi_import.formats import all_formats, supported_mimetypes
 from multi_import.helpers import files as file_helper
 from multi_import.helpers.transactions import transaction
+from multi_import.metrics import ImportMetrics, MultiImportMetrics, QueryCounter
+
+
+def read_file(file_formats, name, content_type, contents):
+    """
+    Reads the contents of an uploaded file in a worker process.
+    """
+    file = SimpleUploadedFile(name, contents, content_type)
+    return file_helper.read(file_formats, file)
 
 
 class MultiImporter(object):
@@ -17,6 +31,18 @@ class MultiImporter(object):
     file_formats = all_formats
     mimetypes = supported_mimetypes
     export_filename = "export"
+    # When enabled, files in a streamable format are parsed while importing
+    stream_files = False
+    # Processes used to encode the items of itemized exports
+    export_workers = None
+    # When set, uploaded files are parsed in a pool of this many workers
+    parse_workers = None
+    parse_executor_class = ThreadPoolExecutor
+    # When set, called with the ProgressEvents of every importer
+    progress_callback = None
+    # When enabled, results have the wall time and query count of each
+    # phase of every importer, and their totals
+    collect_metrics = False
 
     error_messages = {
         "invalid_key": _("Columns should match those in the import template."),
@@ -35,56 +61,94 @@ class MultiImporter(object):
     def get_importer_kwargs(self):
         return {}
 
-    def export(self, empty=False, keys=None):
+    def export(self, empty=False, keys=None, stream=False):
         exporters = self._get_exporters(keys)
 
-        results = tuple(exporter.export(empty=empty) for exporter in exporters)
+        results = tuple(
+            exporter.export(empty=empty, stream=stream) for exporter in exporters
+        )
 
         return MultiExportResult(
             filename=self.get_export_filename(),
             file_formats=self.file_formats,
             results=results,
+            workers=self.export_workers,
         )
 
     @transaction
-    def import_files(self, files):
+    def import_files(self, files, dry_run=False):
         results = MultiImportResult()
 
         data = {}
-        for filename, file in files.items():
-            try:
-                if file.content_type not in self.mimetypes:
-                    msg = (
-                        "{} file types are not supported. Please upload a .csv"
-                        " or .xslx file.".format(file.content_type)
-                    )
-                    raise InvalidFileError(msg)
-
-                dataset = file_helper.read(self.file_formats, file)
-                import_key, data_item = self._identify_dataset(filename, dataset)
-                if import_key in data:
-                    data[import_key].append(data_item)
-                else:
-                    data[import_key] = [data_item]
-            except (InvalidDatasetError, InvalidFileError) as e:
-                results.add_error(filename, str(e))
+        with self._get_parse_executor() as executor:
+            # Files are parsed concurrently, but gathered in the given order
+            reads = [
+                (filename, file, self._read_file(executor, file))
+                for filename, file in files.items()
+            ]
+
+            for filename, file, read in reads:
+                try:
+                    if file.content_type not in self.mimetypes:
+                        msg = (
+                            "{} file types are not supported. Please upload a .csv"
+                            " or .xslx file.".format(file.content_type)
+                        )
+                        raise InvalidFileError(msg)
+
+                    dataset = read()
+                    import_key, data_item = self._identify_dataset(filename, dataset)
+                    if import_key in data:
+                        data[import_key].append(data_item)
+                    else:
+                        data[import_key] = [data_item]
+                except (InvalidDatasetError, InvalidFileError) as e:
+                    results.add_error(filename, str(e))
 
         if not results.valid:
             return results
 
-        return self.import_data(data, transaction=False)
+        return self.import_data(data, dry_run=dry_run, transaction=False)
 
     @transaction
-    def import_data(self, data):
+    def import_data(self, data, dry_run=False):
+        if not self.collect_metrics:
+            for importer in self.importer_instances:
+                importer.metrics = None
+            return self.process_data(data, dry_run)
+
+        query_counter = QueryCounter()
+        metrics = MultiImportMetrics(query_counter)
+        for importer in self.importer_instances:
+            importer.metrics = ImportMetrics(query_counter)
+
+        with query_counter.install(), metrics.measure():
+            results = self.process_data(data, dry_run)
+
+        for importer in self.importer_instances:
+            if importer.metrics.phases:
+                metrics.importers[importer.key] = importer.metrics
+
+        results.metrics = metrics
+        for file in results.files:
+            file["result"].metrics = metrics.importers.get(file["result"].key)
+        return results
+
+    def process_data(self, data, dry_run=False):
         results = MultiImportResult()
 
         context = {
             "model_contexts": {
                 importer.model: importer.get_model_context()
                 for importer in self.importer_instances
-            }
+            },
+            "dry_run": dry_run,
+            "written_models": set(),
         }
 
+        for importer in self.importer_instances:
+            importer.progress = importer.get_progress(self.progress_callback)
+
         bound_importers = self._transform_multi_input(data)
 
         read_datasets = []
@@ -92,17 +156,18 @@ class MultiImporter(object):
         for importer, datasets in bound_importers:
             serializer_context = importer.get_import_serializer_context(context)
 
-            read_datasets.extend(
-                [
-                    (
-                        importer,
-                        importer.read_rows(dataset),
-                        filename,
-                        serializer_context,
-                    )
-                    for filename, dataset in datasets
-                ]
-            )
+            for filename, dataset in datasets:
+                try:
+                    with importer.measure("read_rows"):
+                        rows = importer.read_rows(dataset)
+                except InvalidFileError as e:
+                    results.add_error(filename, str(e))
+                    continue
+
+                read_datasets.append((importer, rows, filename, serializer_context))
+
+        if not results.valid:
+            return results
 
         max_steps = max(
             len(importer.get_serializer_classes())
@@ -110,17 +175,21 @@ class MultiImporter(object):
         )
 
         for importer, rows, _filename, serializer_context in read_datasets:
-            importer.load_instances(rows, serializer_context)
+            with importer.measure("load_instances"):
+                importer.load_instances(rows, serializer_context)
 
         for step in range(max_steps):
             for importer, rows, _filename, serializer_context in read_datasets:
-                importer.process_rows(rows, serializer_context, step)
+                with importer.measure("process_rows", step):
+                    importer.process_rows(rows, serializer_context, step)
 
         for importer, rows, _filename, _serializer_context in read_datasets:
-            importer.validate_rows_post_save(rows)
+            with importer.measure("validate_rows_post_save"):
+                importer.validate_rows_post_save(rows, dry_run)
 
         for importer, rows, _filename, _serializer_context in read_datasets:
-            importer.process_diffs(rows)
+            with importer.measure("process_diffs"):
+                importer.process_diffs(rows)
 
         for importer, rows, filename, _serializer_context in read_datasets:
             result = importer.transform_rows_to_result(rows)
@@ -128,6 +197,36 @@ class MultiImporter(object):
 
         return results
 
+    def _get_parse_executor(self):
+        if self.parse_workers:
+            return self.parse_executor_class(self.parse_workers)
+        return nullcontext()
+
+    def _read_file(self, executor, file):
+        """
+        Starts parsing a file, returning a callable that returns its dataset.
+        """
+        if file.content_type not in self.mimetypes:
+            return None
+
+        if executor is None:
+            return partial(
+                file_helper.read, self.file_formats, file, stream=self.stream_files
+            )
+
+        if isinstance(executor, ProcessPoolExecutor):
+            # Files can not be sent to other processes, and neither can
+            # streams, so their contents are sent and parsed in full
+            file.seek(0)
+            future = executor.submit(
+                read_file, self.file_formats, file.name, file.content_type, file.read()
+            )
+        else:
+            future = executor.submit(
+                file_helper.read, self.file_formats, file, stream=self.stream_files
+            )
+        return future.result
+
     def _sort_importers(self, importers):
         """
         Sorts importers based on their inter-dataset dependencies.
@@ -0,0 +1,80 @@
+import time
+from collections import namedtuple
+
+PHASE_START = "phase_start"
+PHASE_END = "phase_end"
+ROWS = "rows"
+
+ProgressEvent = namedtuple(
+    "ProgressEvent",
+    ["key", "event", "phase", "step", "rows", "total", "elapsed", "rows_per_second"],
+)
+
+
+class Phase(object):
+    """
+    Counts the rows processed in a phase of an import.
+    """
+
+    def __init__(self, progress, name, step=None, total=None):
+        self.progress = progress
+        self.name = name
+        self.step = step
+        self.total = total
+        self.rows = 0
+        self.started = self.reported = progress.clock()
+
+    def advance(self, rows=1):
+        self.rows += rows
+
+        now = self.progress.clock()
+        if now - self.reported >= self.progress.interval:
+            self.reported = now
+            self.progress.emit(self, ROWS, now)
+
+
+class ImportProgress(object):
+    """
+    Reports the start and end of the phases of an import to a callback,
+    and the rows processed at most once per interval in between.
+    """
+
+    clock = staticmethod(time.monotonic)
+
+    def __init__(self, callback, key, interval=1.0):
+        self.callback = callback
+        self.key = key
+        self.interval = interval
+
+    def start(self, name, step=None, total=None):
+        phase = Phase(self, name, step, total)
+        self.emit(phase, PHASE_START, phase.started)
+        return phase
+
+    def end(self, phase):
+        self.emit(phase, PHASE_END, self.clock())
+
+    def track(self, rows, name, step=None, total=None):
+        """
+        Yields the rows, counting each one once it has been processed.
+        """
+        phase = self.start(name, step, total)
+        for row in rows:
+            yield row
+            phase.advance()
+        self.end(phase)
+
+    def emit(self, phase, event, now):
+        elapsed = now - phase.started
+        self.callback(
+            ProgressEvent(
+                key=self.key,
+                event=event,
+                phase=phase.name,
+                step=phase.step,
+                rows=phase.rows,
+                total=phase.total,
+                elapsed=elapsed,
+                rows_per_second=phase.rows / elapsed if elapsed else None,
+            )
+        )
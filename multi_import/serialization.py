@@ -0,0 +1,307 @@
+"""
+A compact binary format for storing import results, such as between
+previewing and confirming an import.
+
+A file starts with a magic number, the format version and flags, followed
+by frames, compressed as one zlib stream when requested. Each frame is a
+type, a length and a JSON payload. The rows of each result are written in
+chunks, with their values stored by column, so headers are stored once per
+result rather than once per row. Diff values equal to the value of the
+column are stored as the column index only.
+"""
+
+import json
+import struct
+import zlib
+from io import BytesIO
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from multi_import.cache import chunked
+from multi_import.data import (
+    ImportResult,
+    MultiImportResult,
+    Row,
+    RowDiff,
+    RowStatus,
+    RowValues,
+    get_column_index,
+)
+
+magic = b"MIRB"
+# Incremented when the layout of the format changes
+version = 1
+
+COMPRESSED = 1
+OMIT_UNCHANGED = 2
+
+HEADER = b"H"
+FILE = b"F"
+ROWS = b"R"
+END = b"."
+
+preamble = struct.Struct(">4sBB")
+frame_header = struct.Struct(">cI")
+
+# Rows per frame
+rows_per_chunk = 1000
+# Bytes read from a file at a time when loading
+read_size = 64 * 1024
+
+
+def dumps(result, **kwargs):
+    return b"".join(iter_dump(result, **kwargs))
+
+
+def dump(result, file, **kwargs):
+    for chunk in iter_dump(result, **kwargs):
+        file.write(chunk)
+
+
+def iter_dump(result, compress=True, omit_unchanged=False, chunk_size=rows_per_chunk):
+    """
+    Yields an ImportResult or MultiImportResult encoded as chunks of bytes.
+    With omit_unchanged, the data of unchanged rows is not stored, and they
+    are loaded with empty data.
+    """
+    flags = (COMPRESSED if compress else 0) | (OMIT_UNCHANGED if omit_unchanged else 0)
+    yield preamble.pack(magic, version, flags)
+
+    frames = iter_frames(result, omit_unchanged, chunk_size)
+    if not compress:
+        yield from frames
+        return
+
+    compressor = zlib.compressobj()
+    for frame in frames:
+        data = compressor.compress(frame)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def iter_frames(result, omit_unchanged, chunk_size):
+    if isinstance(result, MultiImportResult):
+        yield encode_frame(HEADER, {"type": "multi", "errors": result.errors})
+        files = [(file["filename"], file["result"]) for file in result.files]
+    else:
+        yield encode_frame(HEADER, {"type": "import"})
+        files = [(None, result)]
+
+    for filename, import_result in files:
+        yield encode_frame(
+            FILE,
+            {
+                "filename": filename,
+                "key": import_result.key,
+                "headers": import_result.headers,
+                "error": import_result.error,
+                "post_save_validated": import_result.post_save_validated,
+            },
+        )
+
+        headers = import_result.headers or []
+        columns = get_column_index(headers)
+        for rows in chunked(import_result.rows, chunk_size):
+            yield encode_frame(
+                ROWS, encode_rows(rows, headers, columns, omit_unchanged)
+            )
+
+    yield encode_frame(END, None)
+
+
+def encode_frame(frame_type, payload):
+    data = json.dumps(payload, cls=DjangoJSONEncoder, separators=(",", ":"))
+    data = data.encode("utf-8")
+    return frame_header.pack(frame_type, len(data)) + data
+
+
+def encode_rows(rows, headers, columns, omit_unchanged):
+    values = [[] for _header in headers]
+    omitted = []
+    other_data = []
+    errors = []
+    diffs = []
+    # Rows read from the same dataset share their column index
+    aligned_columns = None
+
+    for index, row in enumerate(rows):
+        data = row.data
+        if omit_unchanged and row.status == RowStatus.unchanged:
+            omitted.append(index)
+            data = None
+        elif isinstance(data, RowValues) and data.columns is aligned_columns:
+            pass
+        elif isinstance(data, RowValues) and data.columns == columns:
+            aligned_columns = data.columns
+        elif not isinstance(data, dict) or list(data) != headers:
+            other_data.append([index, dict(data)])
+            data = None
+
+        for header, column in zip(headers, values):
+            column.append(data[header] if data is not None else None)
+
+        if row.errors:
+            errors.append([index, row.errors])
+
+        if row.diff is not None:
+            diffs.append([index, encode_diff(row.diff, data, columns)])
+
+    return {
+        "row_number": [row.row_number for row in rows],
+        "line_number": [row.line_number for row in rows],
+        "status": [row.status for row in rows],
+        "values": values,
+        "omitted": omitted,
+        "other_data": other_data,
+        "errors": errors,
+        "diff": diffs,
+    }
+
+
+def encode_diff(diff, data, columns):
+    entries = []
+    for column, values in diff.items():
+        key = columns.get(column, column)
+        if len(values) == 1 and data is not None and data.get(column) == values[0]:
+            entries.append(key)
+        else:
+            entries.append([key] + list(values))
+    return entries
+
+
+def loads(data):
+    return load(BytesIO(data))
+
+
+def load(file):
+    """
+    Decodes a result from a file, reading it a block at a time.
+    """
+    reader = FrameReader(file)
+
+    frame_type, header = reader.read_frame()
+    if frame_type != HEADER:
+        raise ValueError("Missing header frame.")
+
+    results = MultiImportResult()
+    import_result = None
+    filename = None
+
+    while True:
+        frame_type, payload = reader.read_frame()
+
+        if frame_type == FILE:
+            if import_result is not None:
+                results.add_result(filename, import_result)
+            filename = payload["filename"]
+            import_result = ImportResult(
+                key=payload["key"],
+                headers=payload["headers"],
+                error=payload["error"],
+                post_save_validated=payload.get("post_save_validated", True),
+            )
+            headers = import_result.headers or []
+            columns = get_column_index(headers)
+        elif frame_type == ROWS:
+            for row in decode_rows(payload, headers, columns):
+                import_result.add_row(row)
+        elif frame_type == END:
+            break
+        else:
+            raise ValueError("Unknown frame type {0!r}.".format(frame_type))
+
+    if header["type"] == "import":
+        return import_result
+
+    if import_result is not None:
+        results.add_result(filename, import_result)
+    # Errors of files that could not be read have no result
+    for error_filename, errors in header["errors"].items():
+        results.errors.setdefault(error_filename, errors)
+    return results
+
+
+def decode_rows(payload, headers, columns):
+    omitted = set(payload["omitted"])
+    other_data = dict(payload["other_data"])
+    errors = dict(payload["errors"])
+    diffs = dict(payload["diff"])
+    values = list(zip(*payload["values"]))
+
+    for index, (row_number, line_number, status) in enumerate(
+        zip(payload["row_number"], payload["line_number"], payload["status"])
+    ):
+        if index in omitted:
+            data = {}
+        elif index in other_data:
+            data = other_data[index]
+        else:
+            data = RowValues(columns, values[index] if values else ())
+
+        row = Row(row_number, line_number, data)
+        row.errors = errors.get(index)
+        row.status = status
+        if index in diffs:
+            row.diff = decode_diff(diffs[index], data, headers)
+        yield row
+
+
+def decode_diff(entries, data, headers):
+    diff = RowDiff()
+    for entry in entries:
+        if isinstance(entry, list):
+            key, values = entry[0], entry[1:]
+        else:
+            key = entry
+            values = None
+
+        column = headers[key] if isinstance(key, int) else key
+        diff.update({column: values if values is not None else [data[column]]})
+    return diff
+
+
+class FrameReader(object):
+    """
+    Reads frames from a file, decompressing it as it is read.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.buffer = bytearray()
+
+        data = file.read(preamble.size)
+        if len(data) < preamble.size:
+            raise ValueError("Truncated data.")
+
+        file_magic, file_version, flags = preamble.unpack(data)
+        if file_magic != magic:
+            raise ValueError("Not an import result.")
+        if file_version != version:
+            raise ValueError("Unsupported version {0}.".format(file_version))
+
+        self.decompressor = zlib.decompressobj() if flags & COMPRESSED else None
+
+    def fill(self, size):
+        while len(self.buffer) < size:
+            data = self.file.read(read_size)
+            if not data:
+                if self.decompressor is not None:
+                    self.buffer += self.decompressor.flush()
+                    self.decompressor = None
+                    continue
+                raise ValueError("Truncated data.")
+
+            if self.decompressor is not None:
+                data = self.decompressor.decompress(data)
+            self.buffer += data
+
+    def read(self, size):
+        self.fill(size)
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read_frame(self):
+        frame_type, length = frame_header.unpack(self.read(frame_header.size))
+        return frame_type, json.loads(self.read(length))
@@ -1,7 +1,13 @@
+from django.db.models import Q
 from django.test import TestCase
 
-from multi_import.cache import CachedObject, ObjectCache
-from tests.models import Book
+from multi_import.cache import (
+    CachedObject,
+    CachedQuery,
+    ObjectCache,
+    RelatedLookupCache,
+)
+from tests.models import Book, Person
 
 
 class MyClass(object):
@@ -141,3 +147,180 @@ class ObjectCacheTests(TestCase):
             obj = MyClass(i)
             cache.add(obj)
             self.assertEqual(len(cache), i)
+
+
+class CachedQueryTests(TestCase):
+    def setUp(self):
+        self.justin = Person.objects.create(first_name="Justin", last_name="Trudeau")
+        self.pierre = Person.objects.create(first_name="Pierre", last_name="Trudeau")
+        self.jean = Person.objects.create(first_name="Jean", last_name="Chretien")
+
+    def test_match__loads_whole_queryset(self):
+        cache = CachedQuery(Person.objects.all(), ("pk",))
+
+        with self.assertNumQueries(1):
+            result = cache.match({"pk": str(self.pierre.pk)})
+
+        self.assertEqual(self.pierre, result)
+        self.assertEqual(len(cache), 3)
+
+    def test_scope__loads_only_referenced_instances(self):
+        cache = CachedQuery(Person.objects.all(), ("pk", "first_name"))
+        cache.scope([{"pk": str(self.justin.pk)}, {"first_name": "Jean"}])
+
+        with self.assertNumQueries(2):
+            self.assertEqual(self.justin, cache.match({"pk": str(self.justin.pk)}))
+            self.assertEqual(self.jean, cache.match({"first_name": "Jean"}))
+
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.match({"first_name": "Pierre"}))
+
+    def test_scope__value_pair(self):
+        cache = CachedQuery(Person.objects.all(), (("first_name", "last_name"),))
+        cache.scope([{"first_name": "Pierre", "last_name": "Trudeau"}])
+
+        result = cache.match({"first_name": "Pierre", "last_name": "Trudeau"})
+
+        self.assertEqual(self.pierre, result)
+        self.assertEqual(len(cache), 1)
+
+    def test_scope__iexact(self):
+        cache = CachedQuery(Person.objects.all(), ("first_name__iexact",))
+        cache.scope([{"first_name__iexact": "JUSTIN"}])
+
+        result = cache.match({"first_name__iexact": "justin"})
+
+        self.assertEqual(self.justin, result)
+        self.assertEqual(len(cache), 1)
+
+    def test_scope__skips_invalid_values(self):
+        cache = CachedQuery(Person.objects.all(), ("pk",))
+        cache.scope([{"pk": "invalid"}, {"pk": str(self.jean.pk)}])
+
+        self.assertEqual(self.jean, cache.match({"pk": str(self.jean.pk)}))
+        self.assertIsNone(cache.match({"pk": "invalid"}))
+
+    def test_scope__does_not_query_invalid_values(self):
+        cache = CachedQuery(Person.objects.all(), ("pk",))
+        cache.scope(
+            [{"pk": ""}, {"pk": "invalid"}]
+            + [{"pk": str(person.pk)} for person in (self.justin, self.pierre)]
+        )
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.pierre, cache.match({"pk": str(self.pierre.pk)}))
+
+        self.assertIsNone(cache.match({"pk": ""}))
+
+    def test_scope__chunks_queries(self):
+        cache = CachedQuery(Person.objects.all(), ("pk",))
+        cache.chunk_size = 2
+        cache.scope(
+            [{"pk": str(person.pk)} for person in (self.justin, self.pierre, self.jean)]
+        )
+
+        with self.assertNumQueries(2):
+            cache.match({"pk": str(self.justin.pk)})
+
+        self.assertEqual(len(cache), 3)
+
+    def test_scope__queries_new_values_only(self):
+        cache = CachedQuery(Person.objects.all(), ("first_name",))
+        cache.scope([{"first_name": "Justin"}])
+        cache.match({"first_name": "Justin"})
+        cache.scope([{"first_name": "Justin"}, {"first_name": "Pierre"}])
+
+        with self.assertNumQueries(1):
+            result = cache.match({"first_name": "Pierre"})
+
+        self.assertEqual(self.pierre, result)
+        self.assertEqual(len(cache), 2)
+
+    def test_scope__multiple_results(self):
+        cache = CachedQuery(Person.objects.all(), ("last_name",))
+        cache.scope([{"last_name": "Trudeau"}])
+
+        with self.assertRaises(Person.MultipleObjectsReturned):
+            cache.match({"last_name": "Trudeau"})
+
+
+class RelatedLookupCacheTests(TestCase):
+    def setUp(self):
+        self.justin = Person.objects.create(first_name="Justin", last_name="Trudeau")
+        self.pierre = Person.objects.create(first_name="Pierre", last_name="Trudeau")
+
+    def test_resolve__one_query_per_lookup_field(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("pk", "first_name"))
+
+        with self.assertNumQueries(2):
+            cache.resolve(["Justin", "Pierre", str(self.justin.pk)])
+
+        self.assertEqual(self.justin, cache.get("Justin"))
+        self.assertEqual(self.justin, cache.get(str(self.justin.pk)))
+
+    def test_resolve__queries_new_values_only(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("first_name",))
+        cache.resolve(["Justin"])
+
+        with self.assertNumQueries(1):
+            cache.resolve(["Justin", "Pierre"])
+
+        with self.assertNumQueries(0):
+            cache.resolve(["Pierre"])
+
+        self.assertEqual(self.pierre, cache.get("Pierre"))
+
+    def test_get__iexact(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("first_name__iexact",))
+        cache.resolve(["JUSTIN"])
+
+        self.assertEqual(self.justin, cache.get("JUSTIN"))
+
+    def test_get__unresolved_returns_default(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("first_name",))
+        cache.resolve(["Justin", "Jean"])
+
+        self.assertIsNone(cache.get("Pierre"))
+
+    def test_get__unmatched_does_not_exist(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("pk", "first_name"))
+        cache.resolve(["Jean", "12345"])
+
+        with self.assertNumQueries(0):
+            with self.assertRaises(Person.DoesNotExist):
+                cache.get("Jean")
+            with self.assertRaises(Person.DoesNotExist):
+                cache.get("12345")
+
+    def test_get__inexact_field_returns_default(self):
+        # Matches values like a case insensitive collation
+        class CaseInsensitiveCache(RelatedLookupCache):
+            def _get_filter(self, field, values):
+                return Q(**{"{0}__iregex".format(field): "|".join(values)})
+
+        cache = CaseInsensitiveCache(Person.objects.all(), ("first_name",))
+        cache.resolve(["JUSTIN", "Jean"])
+
+        self.assertIsNone(cache.get("JUSTIN"))
+        self.assertIsNone(cache.get("Jean"))
+
+    def test_get__unsupported_lookup_field_returns_default(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("partner__first_name",))
+
+        with self.assertNumQueries(0):
+            cache.resolve(["Justin"])
+
+        self.assertIsNone(cache.get("Justin"))
+
+    def test_get__invalid_value_skips_lookup_field(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("pk", "first_name"))
+        cache.resolve(["Justin"])
+
+        self.assertEqual(self.justin, cache.get("Justin"))
+
+    def test_get__multiple_results(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("last_name",))
+        cache.resolve(["Trudeau"])
+
+        with self.assertRaises(Person.MultipleObjectsReturned):
+            cache.get("Trudeau")
@@ -0,0 +1,185 @@
+import os
+import tempfile
+from io import BytesIO
+
+from django.test import TestCase, TransactionTestCase
+from tablib import Dataset
+
+from multi_import import checkpoints
+from multi_import.checkpoints import CacheCheckpointStore, FileCheckpointStore
+from multi_import.data import RowStatus
+from tests.models import Person
+from tests.test_importer import PersonImporter, PersonSerializer
+
+
+class CrashingPersonSerializer(PersonSerializer):
+    crash = True
+
+    def validate_first_name(self, value):
+        if value == "Crash" and self.crash:
+            raise RuntimeError("Worker restarted")
+        return value
+
+
+class CheckpointedPersonImporter(PersonImporter):
+    serializer_class = CrashingPersonSerializer
+    import_chunk_size = 2
+
+
+class CheckpointStoreTests(TestCase):
+    def assertStore(self, store):
+        self.assertEqual(store.load("person:abc"), [])
+
+        store.append("person:abc", {"row_number": 3})
+        store.append("person:abc", {"row_number": 5})
+
+        self.assertEqual(
+            store.load("person:abc"), [{"row_number": 3}, {"row_number": 5}]
+        )
+        self.assertEqual(store.load("person:def"), [])
+
+        store.delete("person:abc")
+        self.assertEqual(store.load("person:abc"), [])
+
+    def test_file_store(self):
+        with tempfile.TemporaryDirectory() as directory:
+            self.assertStore(FileCheckpointStore(directory))
+
+    def test_file_store__ignores_partial_records(self):
+        with tempfile.TemporaryDirectory() as directory:
+            store = FileCheckpointStore(directory)
+            store.append("person:abc", {"row_number": 3})
+            with open(store.get_path("person:abc"), "a") as f:
+                f.write('{"row_num')
+
+            self.assertEqual(store.load("person:abc"), [{"row_number": 3}])
+
+    def test_cache_store(self):
+        self.assertStore(CacheCheckpointStore())
+
+    def test_fingerprint_file(self):
+        file = BytesIO(b"id,first_name\n1,Jean\n")
+        file.read()
+
+        fingerprint = checkpoints.fingerprint_file(file)
+
+        self.assertEqual(file.tell(), 0)
+        self.assertEqual(
+            fingerprint, checkpoints.fingerprint_file(BytesIO(file.getvalue()))
+        )
+        self.assertNotEqual(
+            fingerprint, checkpoints.fingerprint_file(BytesIO(b"id,first_name\n"))
+        )
+
+
+class ResumeImportTests(TransactionTestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = FileCheckpointStore(self.directory.name)
+        self.justin = Person.objects.create(first_name="Justin", last_name="Trudeau")
+
+        self.dataset = Dataset(headers=["id", "first_name", "last_name"])
+        self.dataset.append([str(self.justin.pk), "Justin", "Trudeau Jr"])
+        self.dataset.append(["", "Jean", "Chretien"])
+        self.dataset.append(["", "Paul", "Martin"])
+        self.dataset.append(["", "Crash", "Test"])
+        self.dataset.append([str(self.justin.pk), "Justin", "Trudeau"])
+
+    def tearDown(self):
+        self.directory.cleanup()
+        CrashingPersonSerializer.crash = True
+
+    def get_importer(self):
+        importer = CheckpointedPersonImporter()
+        importer.checkpoint_store = self.store
+        return importer
+
+    def test_resume(self):
+        with self.assertRaises(RuntimeError):
+            self.get_importer().import_data(self.dataset, transaction=False)
+
+        self.assertEqual(Person.objects.filter(first_name="Jean").count(), 1)
+        fingerprint = checkpoints.fingerprint_dataset(self.dataset)
+        records = self.store.load("person:{0}".format(fingerprint))
+        self.assertEqual([record["row_number"] for record in records], [3])
+        self.assertEqual(records[0]["loaded_pks"], [self.justin.pk])
+        self.assertEqual(len(records[0]["new_objects"]), 1)
+
+        CrashingPersonSerializer.crash = False
+        result = self.get_importer().import_data(self.dataset, transaction=False)
+
+        # Only the rows after the checkpoint are imported again
+        self.assertEqual([row.row_number for row in result.rows], [4, 5, 6])
+        self.assertEqual(Person.objects.filter(first_name="Jean").count(), 1)
+        self.assertTrue(Person.objects.filter(first_name="Crash").exists())
+        # Justin was already updated before the restart
+        self.assertEqual(
+            result.rows[2].errors,
+            {"non_field_errors": ["This item is being updated more than once."]},
+        )
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_restore_checkpoint__new_objects(self):
+        with self.assertRaises(RuntimeError):
+            self.get_importer().import_data(self.dataset, transaction=False)
+
+        importer = self.get_importer()
+        context = importer.get_import_serializer_context()
+        fingerprint = checkpoints.fingerprint_dataset(self.dataset)
+
+        self.assertEqual(importer.restore_checkpoint(fingerprint, context), 3)
+
+        model_context = context["model_contexts"][Person]
+        self.assertEqual(model_context["loaded_pks"], {self.justin.pk})
+        jean = Person.objects.get(first_name="Jean")
+        self.assertEqual(model_context["new_objects"].get("id", jean.pk), jean)
+
+    def test_no_checkpoints_in_transaction(self):
+        CrashingPersonSerializer.crash = False
+
+        result = self.get_importer().import_data(self.dataset, commit=False)
+
+        self.assertEqual(result.rows[1].status, RowStatus.new)
+        self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_resume__chunk_rolled_back_after_checkpoint(self):
+        class CrashingStore(FileCheckpointStore):
+            def append(self, key, record):
+                super().append(key, record)
+                if record["row_number"] == 5:
+                    raise RuntimeError("Worker restarted")
+
+        CrashingPersonSerializer.crash = False
+        importer = self.get_importer()
+        importer.checkpoint_store = CrashingStore(self.directory.name)
+        with self.assertRaises(RuntimeError):
+            importer.import_data(self.dataset, transaction=False)
+
+        self.assertFalse(Person.objects.filter(first_name="Paul").exists())
+
+        result = self.get_importer().import_data(self.dataset, transaction=False)
+
+        # The rolled back chunk is imported again, creating its rows once
+        self.assertEqual([row.row_number for row in result.rows], [4, 5, 6])
+        self.assertEqual(Person.objects.filter(first_name="Jean").count(), 1)
+        self.assertEqual(Person.objects.filter(first_name="Paul").count(), 1)
+        self.assertEqual(Person.objects.filter(first_name="Crash").count(), 1)
+
+    def test_restore_checkpoint__last_chunk_without_new_objects(self):
+        fingerprint = checkpoints.fingerprint_dataset(self.dataset)
+        importer = self.get_importer()
+        for row_number, new_objects in ((3, [self.justin.pk]), (5, [])):
+            self.store.append(
+                importer.get_checkpoint_key(fingerprint),
+                {
+                    "version": checkpoints.version,
+                    "fingerprint": fingerprint,
+                    "row_number": row_number,
+                    "loaded_pks": [],
+                    "new_objects": new_objects,
+                },
+            )
+        context = importer.get_import_serializer_context()
+
+        self.assertEqual(importer.restore_checkpoint(fingerprint, context), 3)
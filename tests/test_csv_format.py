@@ -1,9 +1,15 @@
+from io import BytesIO
+from unittest import mock
+
 from django.test import TestCase
+from tablib import Dataset
 
 from multi_import.exceptions import InvalidFileError
-from multi_import.formats import csv
+from multi_import.formats import CsvStream, all_formats, csv
+from multi_import.helpers import files
 from multi_import.helpers.files import decode_contents
 from multi_import.helpers.files import read as multi_import_read
+from multi_import.importer import DataReader
 
 
 class CSVFormatTest(TestCase):
@@ -77,3 +83,80 @@ class CSVFormatTest(TestCase):
         for invalid_file in invalid_files:
             with open(invalid_file, "rb") as file, self.assertRaises(InvalidFileError):
                 multi_import_read([csv], file)
+
+    def test_stream_csv_file(self):
+        with open("tests/fixtures/test_file.csv", "rb") as file:
+            dataset = multi_import_read([csv], file)
+            stream = multi_import_read(all_formats, file, stream=True)
+
+            self.assertIsInstance(stream, CsvStream)
+            self.assertEqual(list(stream.headers), list(dataset.headers))
+            self.assertEqual(list(stream), list(dataset))
+
+            streamed_rows = DataReader([]).read(stream)
+            dataset_rows = DataReader([]).read(dataset)
+
+        self.assertEqual(
+            [(row.row_number, row.line_number) for row, _data in streamed_rows],
+            [(row.row_number, row.line_number) for row, _data in dataset_rows],
+        )
+
+    def test_stream_csv_file__small_sample(self):
+        with open("tests/fixtures/test_file.csv", "rb") as file, mock.patch.object(
+            files, "sample_size", 100
+        ):
+            stream = files.read_stream([csv], file)
+            self.assertEqual(len(list(stream)), len(multi_import_read([csv], file)))
+
+    def test_stream_csv_file__encoding_changes_after_sample(self):
+        contents = b"id,first_name,last_name\n" + b",Jean,Chretien\n" * 6000
+        contents += b",Ren\xe9,L\xe9vesque\n"
+        self.assertGreater(contents.index(b"\xe9"), files.sample_size)
+        file = BytesIO(contents)
+
+        stream = files.read_stream([csv], file)
+        rows = list(stream)
+
+        self.assertEqual(rows, list(multi_import_read([csv], file)))
+        self.assertEqual(rows[-1], ("", "Ren\xe9", "L\xe9vesque"))
+        self.assertEqual(len(list(stream)), 6001)
+
+    def test_stream_non_csv_files(self):
+        non_csv_files = [
+            "tests/fixtures/test_file.yaml",
+            "tests/fixtures/test_file.json",
+            "tests/fixtures/test_file.xlsx",
+        ]
+
+        for non_csv_file in non_csv_files:
+            with open(non_csv_file, "rb") as file:
+                self.assertNotIsInstance(
+                    files.read_stream(all_formats, file), CsvStream, non_csv_file
+                )
+
+    def test_stream_pads_short_rows_and_skips_blank_lines(self):
+        file = BytesIO("a,b,c\r\n1,2\r\n\r\n4,5,6\r\n".encode("utf-16"))
+
+        stream = files.read_stream([csv], file)
+
+        self.assertEqual(stream.headers, ["a", "b", "c"])
+        self.assertEqual(list(stream), [("1", "2", ""), ("4", "5", "6")])
+
+    def test_stream_invalid_dimensions(self):
+        file = BytesIO(b"a,b\n1,2\n1,2,3\n")
+
+        # The invalid row is past the sample used for detection
+        with mock.patch.object(files, "sample_size", 10):
+            stream = files.read_stream([csv], file)
+
+        with self.assertRaises(InvalidFileError):
+            list(stream)
+
+    def test_write_stream(self):
+        dataset = Dataset(headers=["name", "notes"])
+        dataset.append(["John", 'Says "hi", often'])
+        dataset.append(["Jos\u00e9", "Line\nbreak"])
+
+        result = b"".join(csv.write_stream(dataset.headers, iter(dataset)))
+
+        self.assertEqual(result, csv.write(dataset).getvalue())
@@ -0,0 +1,108 @@
+from django.test import TestCase
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+from multi_import.cache import RelatedLookupCache
+from multi_import.fields import LookupRelatedField
+from tests.models import Book, Person
+
+
+class BookSerializer(serializers.ModelSerializer):
+    author = LookupRelatedField(
+        lookup_fields=("pk", "first_name"), queryset=Person.objects.all()
+    )
+
+    class Meta:
+        model = Book
+        fields = ("id", "name", "author")
+
+
+class PersonSerializer(serializers.ModelSerializer):
+    children = LookupRelatedField(
+        many=True,
+        lookup_fields=("first_name",),
+        queryset=Person.objects.all(),
+    )
+
+    class Meta:
+        model = Person
+        fields = ("id", "first_name", "last_name", "children")
+
+
+class LookupRelatedFieldTests(TestCase):
+    def setUp(self):
+        self.justin = Person.objects.create(first_name="Justin", last_name="Trudeau")
+        self.pierre = Person.objects.create(first_name="Pierre", last_name="Trudeau")
+
+    def get_field(self, serializer_class, field_name, related_lookups=None):
+        context = {"related_lookups": related_lookups} if related_lookups else {}
+        serializer = serializer_class(context=context)
+        return serializer.fields[field_name]
+
+    def test_to_internal_value__queries_database(self):
+        field = self.get_field(BookSerializer, "author")
+
+        with self.assertNumQueries(1):
+            result = field.to_internal_value("Pierre")
+
+        self.assertEqual(self.pierre, result)
+
+    def test_to_internal_value__uses_related_lookup_cache(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("pk", "first_name"))
+        cache.resolve(["Justin", str(self.pierre.pk)])
+        field = self.get_field(
+            BookSerializer, "author", {(BookSerializer, "author"): cache}
+        )
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.justin, field.to_internal_value("Justin"))
+            self.assertEqual(self.pierre, field.to_internal_value(str(self.pierre.pk)))
+
+    def test_to_internal_value__falls_back_for_unresolved_values(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("pk", "first_name"))
+        cache.resolve(["Justin"])
+        field = self.get_field(
+            BookSerializer, "author", {(BookSerializer, "author"): cache}
+        )
+
+        with self.assertRaises(ValidationError):
+            field.to_internal_value("Jean")
+
+        self.assertEqual(self.pierre, field.to_internal_value("Pierre"))
+
+    def test_to_internal_value__resolved_value_without_match(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("pk", "first_name"))
+        cache.resolve(["Jean"])
+        field = self.get_field(
+            BookSerializer, "author", {(BookSerializer, "author"): cache}
+        )
+
+        with self.assertNumQueries(0), self.assertRaises(ValidationError) as ctx:
+            field.to_internal_value("Jean")
+
+        self.assertEqual(ctx.exception.detail[0].code, "does_not_exist")
+
+    def test_to_internal_value__multiple_matches(self):
+        Person.objects.create(first_name="Justin", last_name="Bieber")
+        cache = RelatedLookupCache(Person.objects.all(), ("first_name",))
+        cache.resolve(["Justin"])
+        field = self.get_field(
+            BookSerializer, "author", {(BookSerializer, "author"): cache}
+        )
+
+        with self.assertNumQueries(0), self.assertRaises(ValidationError) as ctx:
+            field.to_internal_value("Justin")
+
+        self.assertEqual(ctx.exception.detail[0].code, "multiple_matches")
+
+    def test_to_internal_value__many_related_child(self):
+        cache = RelatedLookupCache(Person.objects.all(), ("first_name",))
+        cache.resolve(["Justin", "Pierre"])
+        field = self.get_field(
+            PersonSerializer, "children", {(PersonSerializer, "children"): cache}
+        )
+
+        with self.assertNumQueries(0):
+            result = field.to_internal_value(["Justin", "Pierre"])
+
+        self.assertEqual([self.justin, self.pierre], result)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import codecs
+from unittest import mock
+
+import chardet
+from django.test import TestCase
+
+from multi_import.formats import csv
+from multi_import.helpers import charsets
+
+
+class CharsetHelperTests(TestCase):
+    def test_detect_encoding__byte_order_marks(self):
+        self.assertEqual(charsets.detect_encoding(codecs.BOM_UTF8 + b"id"), "utf-8-sig")
+        self.assertEqual(charsets.detect_encoding("id".encode("utf-16")), "utf-16")
+
+    def test_detect_encoding__utf_8_cut_in_sample(self):
+        sample = "Đà".encode("utf-8")[:-1]
+
+        with mock.patch.object(chardet, "detect") as detect:
+            self.assertEqual(charsets.detect_encoding(sample), "utf-8")
+
+        detect.assert_not_called()
+
+    def test_detect_encoding__chardet_on_bounded_sample(self):
+        contents = "Latin-1 character: ¥ ".encode("ISO-8859-1") * 10000
+
+        with mock.patch.object(chardet, "detect", wraps=chardet.detect) as detect:
+            encoding = charsets.detect_encoding(contents)
+
+        self.assertLessEqual(len(detect.call_args[0][0]), charsets.sample_size)
+        self.assertEqual(contents.decode(encoding)[:20], "Latin-1 character: ¥")
+
+    def test_decode__strips_byte_order_mark(self):
+        contents = codecs.BOM_UTF8 + "id,name\n1,Đà".encode("utf-8")
+
+        self.assertEqual(charsets.decode(contents), "id,name\n1,Đà")
+
+    def test_decode__falls_back_when_rest_of_file_differs(self):
+        contents = b"a" * charsets.sample_size + "¥".encode("ISO-8859-1")
+
+        self.assertEqual(charsets.decode(contents)[-1], "¥")
+
+    def test_csv_ensure_unicode(self):
+        contents = "id,name\n1,Đà".encode("utf-16")
+
+        self.assertEqual(csv.ensure_unicode(contents), "id,name\n1,Đà")
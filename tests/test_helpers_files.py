@@ -1,12 +1,21 @@
 # -*- coding: utf-8 -*-
 from io import BytesIO
+from unittest import mock
 
 import chardet
 from django.test import TestCase
 
+from multi_import import formats
 from multi_import.helpers import files
 
 
+class UploadedFile(BytesIO):
+    def __init__(self, contents, name=None, content_type=None):
+        super().__init__(contents)
+        self.name = name
+        self.content_type = content_type
+
+
 class FileHelperTests(TestCase):
     def test_decode_file_when_reading_utf_8(self):
         file = BytesIO()
@@ -50,3 +59,69 @@ class FileHelperTests(TestCase):
 
         decoded_file_contents = files.decode_contents(file_contents)
         self.assertTrue(type(decoded_file_contents), str)
+
+
+class SniffFormatTests(TestCase):
+    def sniff(self, contents, name=None, content_type=None):
+        file = UploadedFile(contents, name, content_type)
+        return files.sniff_format(formats.all_formats, file, contents)
+
+    def test_sniff_magic_numbers(self):
+        with open("tests/fixtures/test_file.xlsx", "rb") as file:
+            contents = file.read()
+
+        self.assertIs(self.sniff(contents, "data.csv"), formats.xlsx)
+        self.assertIs(self.sniff(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"), formats.xls)
+
+    def test_sniff_extension(self):
+        self.assertIs(self.sniff(b"a,b\n1,2\n", "data.CSV"), formats.csv)
+        self.assertIs(self.sniff(b"- a: 1\n", "data.yml"), formats.yaml)
+        self.assertIs(self.sniff(b'[{"a": 1}]', "data.json"), formats.json)
+
+    def test_sniff_ignores_binary_content_types_for_text(self):
+        # Browsers commonly upload CSV files as Excel
+        self.assertIs(
+            self.sniff(b"a,b\n", "data.csv", "application/vnd.ms-excel"), formats.csv
+        )
+
+    def test_sniff_content_type(self):
+        self.assertIs(self.sniff(b"a,b\n", content_type="text/csv"), formats.csv)
+        self.assertIs(
+            self.sniff(b"a: 1\n", content_type="application/x-yaml"), formats.yaml
+        )
+
+    def test_sniff_leading_characters(self):
+        self.assertIs(self.sniff(b'\xef\xbb\xbf  [{"a": 1}]'), formats.json)
+        self.assertIs(
+            self.sniff(b'{"a": 1}', content_type="application/octet-stream"),
+            formats.ndjson,
+        )
+
+    def test_sniff_ambiguous(self):
+        # Nothing to go on
+        self.assertIsNone(self.sniff(b"a,b\n1,2\n"))
+        # Name and content type disagree
+        self.assertIsNone(
+            self.sniff(b"a,b\n", "data.csv", content_type="application/x-yaml")
+        )
+        # Name disagrees with the contents
+        self.assertIsNone(self.sniff(b'[{"a": 1}]', "data.csv"))
+        self.assertIsNone(self.sniff(b"a,b\n", "data.json"))
+        # Binary content without known magic numbers
+        self.assertIsNone(self.sniff(b"\x00\x01\x02", "data.csv"))
+
+    def test_read_sniffed_file_skips_detection(self):
+        file = UploadedFile(b"a,b\n1,2\n", "data.csv", "text/csv")
+
+        with mock.patch.object(formats.CsvFormat, "detect") as detect:
+            dataset = files.read(formats.all_formats, file)
+
+        detect.assert_not_called()
+        self.assertEqual(dataset.headers, ["a", "b"])
+
+    def test_read_ambiguous_file_falls_back_to_detection(self):
+        file = UploadedFile(b"a,b\n1,2\n")
+
+        dataset = files.read(formats.all_formats, file)
+
+        self.assertEqual(dataset.headers, ["a", "b"])
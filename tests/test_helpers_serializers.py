@@ -1,5 +1,8 @@
+from unittest import mock
+
+from django.db.models.signals import post_save
 from django.test import TestCase
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import CharField, ModelSerializer
 
 from multi_import.fields import LookupRelatedField
 from multi_import.helpers import serializers
@@ -34,7 +37,45 @@ class PersonSerializer(ModelSerializer):
         read_only_fields = ("id", "name")
 
 
+class BulkPersonSerializer(ModelSerializer):
+    class Meta:
+        model = Person
+        fields = ("id", "first_name", "last_name")
+
+
+class NamePersonSerializer(ModelSerializer):
+    name = CharField()
+
+    class Meta:
+        model = Person
+        fields = ("id", "name")
+
+
 class SerializerHelperTests(TestCase):
+    def test_can_bulk_save(self):
+        self.assertTrue(serializers.can_bulk_save(BulkPersonSerializer()))
+        self.assertFalse(serializers.can_bulk_save(PersonSerializer()))
+
+    def test_can_bulk_save__requires_concrete_model_fields(self):
+        self.assertFalse(serializers.can_bulk_save(NamePersonSerializer()))
+
+    def test_can_bulk_save__not_with_custom_save(self):
+        def save(self, *args, **kwargs):
+            pass
+
+        with mock.patch.object(Person, "save", save):
+            self.assertFalse(serializers.can_bulk_save(BulkPersonSerializer()))
+
+    def test_can_bulk_save__not_with_save_signals(self):
+        def receiver(sender, **kwargs):
+            pass
+
+        post_save.connect(receiver, sender=Person)
+        try:
+            self.assertFalse(serializers.can_bulk_save(BulkPersonSerializer()))
+        finally:
+            post_save.disconnect(receiver, sender=Person)
+
     def test_returns_correct_dependencies(self):
         serializer = BookSerializer()
         dependencies = serializers.get_dependencies(serializer)
@@ -176,3 +217,26 @@ class SerializerHelperTests(TestCase):
                 "partner": [""],
             },
         )
+
+    def test_original_representation_is_cached(self):
+        justin = Person.objects.create(first_name="Justin", last_name="Trudeau")
+        hadrien = Person.objects.create(first_name="Hadrien", last_name="Trudeau")
+        justin.children.add(hadrien)
+
+        serializer = PersonSerializer(
+            justin,
+            data={"first_name": "Justin", "last_name": "Trudeau 2", "partner": ""},
+        )
+        serializer.is_valid()
+        cache = {}
+
+        # Only the first representation queries the children
+        with self.assertNumQueries(1):
+            serializers.might_have_changes(serializer, cache)
+            serializers.has_changes(serializer, cache=cache)
+            serializers.get_diff_data(serializer, cache=cache)
+
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            serializers.get_original_representation(serializer, cache)
@@ -0,0 +1,1024 @@
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
+from tablib import Dataset
+
+from multi_import import formats
+from multi_import.data import (
+    ExportMode,
+    ImportResult,
+    MultiImportResult,
+    Row,
+    RowDiff,
+    RowStatus,
+)
+from multi_import.fields import LookupRelatedField
+from multi_import.helpers import files
+from multi_import.importer import DataReader, Importer
+from multi_import.multi_importer import MultiImporter
+from tests.models import Book, Chapter, Person
+
+
+class PersonSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Person
+        fields = ("id", "first_name", "last_name")
+
+
+class ParallelPersonSerializer(PersonSerializer):
+    validated_in_threads = set()
+
+    class Meta(PersonSerializer.Meta):
+        parallel_validation = True
+
+    def validate_last_name(self, value):
+        self.validated_in_threads.add(threading.get_ident())
+        if value == "Invalid":
+            raise serializers.ValidationError("Invalid last name.")
+        return value
+
+
+class BookSerializer(serializers.ModelSerializer):
+    author = LookupRelatedField(
+        lookup_fields=("first_name",), queryset=Person.objects.all()
+    )
+    chapters = LookupRelatedField(
+        many=True,
+        required=False,
+        lookup_fields=("name",),
+        queryset=Chapter.objects.all(),
+    )
+
+    class Meta:
+        model = Book
+        fields = ("id", "name", "author", "chapters")
+
+
+class PersonImporter(Importer):
+    key = "person"
+    model = Person
+    id_column = "id"
+    lookup_fields = ("id",)
+    serializer_class = PersonSerializer
+
+
+class BookImporter(Importer):
+    key = "book"
+    model = Book
+    id_column = "id"
+    lookup_fields = ("id",)
+    serializer_class = BookSerializer
+
+
+class ResolvedBookImporter(BookImporter):
+    resolve_related_lookups = True
+
+
+class BulkPersonImporter(PersonImporter):
+    lookup_fields = ("id", "first_name")
+    bulk_save = True
+    bulk_batch_size = 2
+
+
+class ParallelPersonImporter(PersonImporter):
+    serializer_class = ParallelPersonSerializer
+    validation_workers = 2
+
+
+class UniqueParallelPersonSerializer(ParallelPersonSerializer):
+    first_name = serializers.CharField(
+        validators=[UniqueValidator(queryset=Person.objects.all())]
+    )
+
+
+class UniqueParallelPersonImporter(ParallelPersonImporter):
+    serializer_class = UniqueParallelPersonSerializer
+
+
+class UniquePersonSerializer(PersonSerializer):
+    first_name = serializers.CharField(
+        validators=[UniqueValidator(queryset=Person.objects.all())]
+    )
+
+
+class UniquePersonImporter(PersonImporter):
+    serializer_class = UniquePersonSerializer
+
+
+class UniqueBulkPersonImporter(BulkPersonImporter):
+    serializer_class = UniquePersonSerializer
+
+
+def validate_last_name(instance):
+    if instance.last_name == "Elliott Trudeau":
+        raise serializers.ValidationError("Invalid last name.")
+
+
+class PostSavePersonSerializer(PersonSerializer):
+    class Meta(PersonSerializer.Meta):
+        post_create_validators = [validate_last_name]
+        post_update_validators = [validate_last_name]
+
+
+class PostSavePersonImporter(PersonImporter):
+    serializer_class = PostSavePersonSerializer
+
+
+class ChapterSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Chapter
+        fields = ("id", "name", "text")
+
+
+class ChapterImporter(Importer):
+    key = "chapter"
+    model = Chapter
+    lookup_fields = ("id",)
+    serializer_class = ChapterSerializer
+
+
+class BulkMultiImporter(MultiImporter):
+    importers = [BookImporter, BulkPersonImporter]
+
+
+class LibraryMultiImporter(MultiImporter):
+    importers = [BookImporter, PersonImporter]
+
+
+class DataReaderTests(TestCase):
+    def test_read__normalizes_and_converts_values(self):
+        dataset = Dataset(headers=["id", "name", "author", "chapters", "extra"])
+        dataset.append([1.0, " Book\r\n2 ", "Justin", "One; Two;", None])
+        dataset.append(["", "", "", "", ""])
+
+        rows = list(DataReader(BookImporter().empty_serializers).read(dataset))
+
+        self.assertEqual(len(rows), 1)
+        row, _data = rows[0]
+        self.assertEqual(
+            row.data,
+            {
+                "id": "1",
+                "name": "Book\n2",
+                "author": "Justin",
+                "chapters": ["One", " Two"],
+                "extra": "",
+            },
+        )
+
+    def test_read__rows_share_the_column_index(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append(["", "Jean", "Chretien"])
+        dataset.append(["", "Paul", "Martin"])
+
+        rows = [row for row, _data in DataReader([]).read(dataset)]
+
+        self.assertIs(rows[0].data.columns, rows[1].data.columns)
+        self.assertEqual(rows[1].data.values, ("", "Paul", "Martin"))
+        self.assertEqual(list(rows[1].data), ["id", "first_name", "last_name"])
+        self.assertEqual(rows[1].data["first_name"], "Paul")
+        self.assertNotIn("unknown", rows[1].data)
+        self.assertEqual(type(rows[1].data.copy()), dict)
+
+    def test_get_column_plan(self):
+        reader = DataReader(BookImporter().empty_serializers)
+
+        plan = reader.get_column_plan(["chapters", "unknown"])
+
+        self.assertEqual(plan[0].index, 0)
+        self.assertEqual(plan[0].source, "chapters")
+        self.assertIsNotNone(plan[0].converter)
+        self.assertIsNone(plan[1].field)
+        self.assertIsNone(plan[1].converter)
+
+
+class RowTests(TestCase):
+    def test_diff__only_stores_originals_of_changed_columns(self):
+        diff = RowDiff()
+        diff.update({"first_name": ["Pierre"], "last_name": ["Trudeau", "Elliott"]})
+        diff.update({"first_name": ["Pierre", "Justin"]})
+
+        self.assertEqual(
+            dict(diff),
+            {"first_name": ["Pierre", "Justin"], "last_name": ["Trudeau", "Elliott"]},
+        )
+        diff.update({"last_name": ["Elliott"]})
+        self.assertEqual(diff.originals, {"first_name": "Pierre"})
+        self.assertEqual(diff["last_name"], ["Elliott"])
+
+    def test_to_json(self):
+        person = Person.objects.create(first_name="Pierre", last_name="Trudeau")
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append([str(person.pk), "Pierre", "Elliott Trudeau"])
+
+        result = PersonImporter().import_data(dataset)
+
+        expected = {
+            "row_number": 2,
+            "line_number": 2,
+            "data": {
+                "id": str(person.pk),
+                "first_name": "Pierre",
+                "last_name": "Elliott Trudeau",
+            },
+            "errors": None,
+            "status": RowStatus.update,
+            "diff": {
+                "id": [str(person.pk)],
+                "first_name": ["Pierre"],
+                "last_name": ["Trudeau", "Elliott Trudeau"],
+            },
+        }
+        row_json = result.rows[0].to_json()
+        self.assertEqual(row_json, expected)
+        self.assertEqual(type(row_json["data"]), dict)
+        self.assertEqual(Row.from_json(row_json).to_json(), expected)
+        self.assertFalse(hasattr(result.rows[0], "__dict__"))
+
+
+class ImportResultTests(TestCase):
+    def get_rows(self, *statuses):
+        rows = []
+        for index, status in enumerate(statuses):
+            row = Row(index + 2, index + 2, {})
+            row.status = status
+            rows.append(row)
+        return rows
+
+    def test_indexes_rows_by_status(self):
+        rows = self.get_rows(
+            RowStatus.new, RowStatus.unchanged, RowStatus.update, RowStatus.new
+        )
+        result = ImportResult("person", rows=rows)
+
+        self.assertEqual(result.new_rows, [rows[0], rows[3]])
+        self.assertEqual(result.updated_rows, [rows[2]])
+        self.assertEqual(result.unchanged_rows, [rows[1]])
+        self.assertEqual(result.changes, [rows[0], rows[2], rows[3]])
+        self.assertEqual(result.num_changes, 3)
+        self.assertTrue(result.has_changes)
+        self.assertTrue(result.valid)
+
+    def test_reindexes_rows_when_they_change(self):
+        rows = self.get_rows(RowStatus.unchanged, RowStatus.new, RowStatus.unchanged)
+        result = ImportResult("person", rows=rows)
+
+        rows[2].status = RowStatus.new
+        rows[0].status = RowStatus.new
+        self.assertEqual(result.new_rows, rows)
+        self.assertEqual(result.unchanged_rows, [])
+
+        rows[1].set_error("Invalid")
+        self.assertFalse(result.valid)
+        self.assertEqual([error["row_number"] for error in result.errors], [3])
+        self.assertEqual(result.new_rows, [rows[0], rows[2]])
+        self.assertEqual(result.changes, rows)
+
+        rows[1].errors = None
+        rows[1].status = RowStatus.unchanged
+        self.assertTrue(result.valid)
+        self.assertEqual(result.num_changes, 2)
+
+    def test_multi_import_result_changes(self):
+        results = MultiImportResult()
+        results.add_result(
+            "people.csv", ImportResult("person", rows=self.get_rows(RowStatus.new))
+        )
+        unchanged = self.get_rows(RowStatus.unchanged)
+        results.add_result("books.csv", ImportResult("book", rows=unchanged))
+
+        self.assertEqual(results.num_changes(), 1)
+        self.assertTrue(results.has_changes())
+
+        results.files[0]["result"].rows[0].status = RowStatus.unchanged
+        self.assertEqual(results.num_changes(), 0)
+        self.assertFalse(results.has_changes())
+
+
+class ImporterTests(TestCase):
+    def setUp(self):
+        self.justin = Person.objects.create(first_name="Justin", last_name="Trudeau")
+        self.pierre = Person.objects.create(first_name="Pierre", last_name="Trudeau")
+
+    def test_get_lookup_data(self):
+        row = Row(2, 2, {"id": "1", "name": "Book", "unknown": "value"})
+
+        self.assertEqual(
+            BookImporter().get_lookup_data(row), {"id": "1", "name": "Book"}
+        )
+
+    def test_get_lookup_data__sources_of_every_serializer(self):
+        class PkPersonSerializer(serializers.ModelSerializer):
+            id = serializers.IntegerField(source="pk", read_only=True)
+
+            class Meta:
+                model = Person
+                fields = ("id", "last_name")
+
+        class TwoStepPersonImporter(PersonImporter):
+            serializer_classes = (PersonSerializer, PkPersonSerializer)
+
+        importer = TwoStepPersonImporter()
+        row = Row(2, 2, {"id": "1", "first_name": "Justin", "last_name": "Trudeau"})
+
+        self.assertEqual(
+            importer.get_lookup_data(row),
+            {"id": "1", "pk": "1", "first_name": "Justin", "last_name": "Trudeau"},
+        )
+
+    def test_import_data__new_and_updated_rows(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append([str(self.justin.pk), "Justin", "Trudeau"])
+        dataset.append([str(self.pierre.pk), "Pierre", "Elliott Trudeau"])
+        dataset.append(["", "Jean", "Chretien"])
+
+        result = PersonImporter().import_data(dataset)
+
+        self.assertTrue(result.valid)
+        statuses = [row.status for row in result.rows]
+        self.assertEqual(
+            statuses, [RowStatus.unchanged, RowStatus.update, RowStatus.new]
+        )
+        self.pierre.refresh_from_db()
+        self.assertEqual(self.pierre.last_name, "Elliott Trudeau")
+        self.assertTrue(Person.objects.filter(first_name="Jean").exists())
+
+    def test_import_file__stream(self):
+        importer = PersonImporter()
+        importer.stream_files = True
+        file = BytesIO(b"id,first_name,last_name\n,Jean,Chretien\n,Kim,Campbell\n")
+
+        result = importer.import_file(file)
+
+        self.assertTrue(result.valid, result.errors)
+        self.assertEqual([row.line_number for row in result.rows], [2, 3])
+        self.assertTrue(Person.objects.filter(first_name="Kim").exists())
+
+    def test_import_file__stream_invalid_row(self):
+        importer = PersonImporter()
+        importer.stream_files = True
+        file = BytesIO(b"id,first_name,last_name\n,Jean,Chretien\n,Kim,Campbell,1\n")
+
+        with mock.patch.object(files, "sample_size", 40):
+            result = importer.import_file(file)
+
+        self.assertFalse(result.valid)
+        self.assertIsNotNone(result.error)
+        self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+
+    def test_import_data__commit_false_rolls_back(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append(["", "Jean", "Chretien"])
+
+        result = PersonImporter().import_data(dataset, commit=False)
+
+        self.assertEqual(result.rows[0].status, RowStatus.new)
+        self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+
+    def test_import_data__resolves_related_lookups_in_bulk(self):
+        Chapter.objects.create(name="One", text="")
+        Chapter.objects.create(name="Two", text="")
+        dataset = Dataset(headers=["id", "name", "author", "chapters"])
+        for i in range(10):
+            author = "Justin" if i % 2 else "Pierre"
+            dataset.append(["", "Book {0}".format(i), author, "One;Two"])
+
+        with CaptureQueriesContext(connection) as unbatched:
+            BookImporter().import_data(dataset)
+
+        Book.objects.all().delete()
+
+        with CaptureQueriesContext(connection) as batched:
+            result = ResolvedBookImporter().import_data(dataset)
+
+        self.assertTrue(result.valid, result.errors)
+        # 10 author lookups and 20 chapter lookups are replaced by 2 queries
+        self.assertEqual(len(unbatched) - len(batched), 28)
+        self.assertEqual(Book.objects.filter(author=self.justin).count(), 5)
+        self.assertEqual(Book.objects.get(name="Book 0").chapters.count(), 2)
+
+    def test_import_data__related_lookup_errors(self):
+        Person.objects.create(first_name="Justin", last_name="Bieber")
+        dataset = Dataset(headers=["id", "name", "author"])
+        dataset.append(["", "Book", "Justin"])
+        dataset.append(["", "Book", "Jean"])
+
+        for importer in (BookImporter(), ResolvedBookImporter()):
+            result = importer.import_data(dataset)
+
+            self.assertFalse(result.valid)
+            self.assertEqual(
+                [error["message"] for error in result.errors],
+                [
+                    "Multiple matches found for: Justin",
+                    'No match found for: "Jean".',
+                ],
+            )
+
+    def test_import_data__unmatched_related_lookups_are_not_queried(self):
+        def get_dataset(authors):
+            dataset = Dataset(headers=["id", "name", "author"])
+            for i in range(authors):
+                dataset.append(["", "Book {0}".format(i), "Author {0}".format(i)])
+            return dataset
+
+        with CaptureQueriesContext(connection) as one:
+            ResolvedBookImporter().import_data(get_dataset(1))
+        with CaptureQueriesContext(connection) as many:
+            result = ResolvedBookImporter().import_data(get_dataset(20))
+
+        self.assertEqual(len(result.errors), 20)
+        self.assertEqual(len(one), len(many))
+
+    def test_import_data__related_lookup_of_changed_value(self):
+        class PartnerSerializer(PersonSerializer):
+            partner = LookupRelatedField(
+                lookup_fields=("first_name",),
+                queryset=Person.objects.all(),
+                required=False,
+                allow_null=True,
+            )
+
+            class Meta(PersonSerializer.Meta):
+                fields = ("id", "first_name", "last_name", "partner")
+
+        class PartnerImporter(PersonImporter):
+            serializer_class = PartnerSerializer
+
+        dataset = Dataset(headers=["id", "first_name", "last_name", "partner"])
+        dataset.append([str(self.justin.pk), "Justine", "Trudeau", ""])
+        dataset.append(["", "Sophie", "Gregoire", "Justine"])
+
+        result = PartnerImporter().import_data(dataset)
+
+        self.assertTrue(result.valid, result.errors)
+        sophie = Person.objects.get(first_name="Sophie")
+        self.assertEqual(sophie.partner, self.justin)
+
+    def test_import_data__bulk_save(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append([str(self.justin.pk), "Justin", "Trudeau"])
+        dataset.append([str(self.pierre.pk), "Pierre", "Elliott Trudeau"])
+        for i in range(3):
+            dataset.append(["", "Jean {0}".format(i), "Chretien"])
+
+        with CaptureQueriesContext(connection) as queries:
+            result = BulkPersonImporter().import_data(dataset)
+
+        self.assertTrue(result.valid, result.errors)
+        self.assertEqual(
+            [row.status for row in result.rows],
+            [RowStatus.unchanged, RowStatus.update] + [RowStatus.new] * 3,
+        )
+        self.pierre.refresh_from_db()
+        self.assertEqual(self.pierre.last_name, "Elliott Trudeau")
+        self.assertEqual(Person.objects.filter(last_name="Chretien").count(), 3)
+        inserts = [q for q in queries.captured_queries if "INSERT" in q["sql"]]
+        updates = [q for q in queries.captured_queries if "UPDATE" in q["sql"]]
+        self.assertEqual(len(inserts), 2)
+        self.assertEqual(len(updates), 1)
+
+    def test_import_data__bulk_save_of_unique_rows(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append(["", "Jean", "Chretien"])
+        dataset.append(["", "Jean", "Charest"])
+
+        result = UniqueBulkPersonImporter().import_data(dataset, commit=False)
+
+        self.assertEqual([row.status for row in result.rows], [RowStatus.new, None])
+        self.assertEqual(result.errors[0]["row_number"], 3)
+        self.assertEqual(result.errors[0]["message"], "This field must be unique.")
+
+    def test_import_data__bulk_save_caches_new_objects(self):
+        people = Dataset(headers=["id", "first_name", "last_name"])
+        people.append(["", "Jean", "Chretien"])
+        books = Dataset(headers=["id", "name", "author"])
+        books.append(["", "Straight from the Heart", "Jean"])
+
+        result = BulkMultiImporter().import_data(
+            {"person": [("people.csv", people)], "book": [("books.csv", books)]}
+        )
+
+        self.assertTrue(result.valid, result.errors)
+        book = Book.objects.get(name="Straight from the Heart")
+        self.assertEqual(book.author.first_name, "Jean")
+
+    def test_import_data__dry_run(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append([str(self.justin.pk), "Justin", "Trudeau"])
+        dataset.append([str(self.pierre.pk), "Pierre", "Elliott Trudeau"])
+        dataset.append(["", "Jean", "Chretien"])
+
+        with CaptureQueriesContext(connection) as queries:
+            result = PersonImporter().import_data(dataset, dry_run=True)
+
+        self.assertTrue(result.valid)
+        self.assertEqual(
+            [row.status for row in result.rows],
+            [RowStatus.unchanged, RowStatus.update, RowStatus.new],
+        )
+        self.assertEqual(
+            result.rows[1].diff["last_name"], ["Trudeau", "Elliott Trudeau"]
+        )
+        for query in queries.captured_queries:
+            self.assertFalse(
+                query["sql"].startswith(("INSERT", "UPDATE")), query["sql"]
+            )
+        self.pierre.refresh_from_db()
+        self.assertEqual(self.pierre.last_name, "Trudeau")
+        self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+
+    def test_import_data__dry_run_post_save_validation(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append([str(self.pierre.pk), "Pierre", "Elliott Trudeau"])
+        dataset.append(["", "Jean", "Elliott Trudeau"])
+
+        result = PostSavePersonImporter().import_data(dataset, dry_run=True)
+
+        self.assertEqual([row.status for row in result.rows], [None, RowStatus.new])
+        self.assertEqual(
+            [(error["row_number"], error["message"]) for error in result.errors],
+            [(2, "Invalid last name.")],
+        )
+        # The placeholder instances of new rows are not validated
+        self.assertFalse(result.post_save_validated)
+        self.assertFalse(ImportResult.from_json(result.to_json()).post_save_validated)
+
+        result = PostSavePersonImporter().import_data(dataset, commit=False)
+
+        self.assertEqual(len(result.errors), 2)
+        self.assertTrue(result.post_save_validated)
+
+    def test_import_data__dry_run_of_unique_rows(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append(["", "Jean", "Chretien"])
+        dataset.append(["", "Jean", "Charest"])
+
+        for importer in (UniquePersonImporter(), UniqueBulkPersonImporter()):
+            result = importer.import_data(dataset, dry_run=True)
+
+            self.assertEqual([row.status for row in result.rows], [RowStatus.new, None])
+            self.assertEqual(result.errors[0]["row_number"], 3)
+            self.assertTrue(result.post_save_validated)
+            self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+
+        # Rows saved outside of a transaction are rolled back too
+        UniquePersonImporter().import_data(dataset, transaction=False, dry_run=True)
+        self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+
+    def test_import_data__dry_run_resolves_new_objects(self):
+        Chapter.objects.create(name="Introduction")
+        people = Dataset(headers=["id", "first_name", "last_name"])
+        people.append(["", "Jean", "Chretien"])
+        books = Dataset(headers=["id", "name", "author", "chapters"])
+        books.append(["", "Straight from the Heart", "Jean", "Introduction"])
+        books.append(["", "Unknown", "Paul", ""])
+
+        with CaptureQueriesContext(connection) as queries:
+            result = BulkMultiImporter().import_data(
+                {"person": [("people.csv", people)], "book": [("books.csv", books)]},
+                dry_run=True,
+            )
+
+        self.assertEqual(list(result.errors), ["books.csv"])
+        book_result = result.files[1]["result"]
+        self.assertEqual(book_result.rows[0].status, RowStatus.new)
+        self.assertFalse(book_result.rows[0].errors)
+        self.assertTrue(book_result.rows[1].errors)
+        self.assertEqual(book_result.rows[0].diff["chapters"], ["", "Introduction"])
+        for query in queries.captured_queries:
+            self.assertFalse(
+                query["sql"].startswith(("INSERT", "UPDATE")), query["sql"]
+            )
+        self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+
+    def test_import_data__parallel_validation(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append([str(self.justin.pk), "Justin", "Trudeau"])
+        dataset.append([str(self.pierre.pk), "Pierre", "Elliott Trudeau"])
+        dataset.append(["", "Jean", "Invalid"])
+        dataset.append(["", "Paul", "Martin"])
+        ParallelPersonSerializer.validated_in_threads.clear()
+
+        result = ParallelPersonImporter().import_data(dataset, commit=False)
+
+        self.assertNotIn(
+            threading.get_ident(), ParallelPersonSerializer.validated_in_threads
+        )
+        self.assertEqual(
+            [row.status for row in result.rows],
+            [RowStatus.unchanged, RowStatus.update, None, RowStatus.new],
+        )
+        self.assertEqual(
+            result.errors,
+            [
+                {
+                    "line_number": 4,
+                    "row_number": 4,
+                    "message": "Invalid last name.",
+                    "attribute": "last_name",
+                }
+            ],
+        )
+
+    def test_import_data__chunks(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append([str(self.justin.pk), "Justin", "Trudeau"])
+        dataset.append([str(self.pierre.pk), "Pierre", "Elliott Trudeau"])
+        dataset.append(["", "Jean", "Chretien"])
+        dataset.append(["", "", ""])
+        dataset.append(["", "Paul", "Martin"])
+        importer = PersonImporter()
+        importer.import_chunk_size = 2
+
+        with CaptureQueriesContext(connection) as queries:
+            result = importer.import_data(dataset)
+
+        self.assertTrue(result.valid)
+        self.assertEqual(result.headers, ["id", "first_name", "last_name"])
+        self.assertEqual(
+            [(row.row_number, row.status) for row in result.rows],
+            [
+                (2, RowStatus.unchanged),
+                (3, RowStatus.update),
+                (4, RowStatus.new),
+                (6, RowStatus.new),
+            ],
+        )
+        self.assertEqual(
+            result.rows[1].diff["last_name"], ["Trudeau", "Elliott Trudeau"]
+        )
+        savepoints = [q for q in queries.captured_queries if "RELEASE" in q["sql"]]
+        self.assertEqual(len(savepoints), 3)
+        self.assertTrue(Person.objects.filter(first_name="Paul").exists())
+
+    def test_import_data__chunks_detect_multiple_updates(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append([str(self.pierre.pk), "Pierre", "Elliott Trudeau"])
+        dataset.append(["", "Jean", "Chretien"])
+        dataset.append([str(self.pierre.pk), "Pierre", "Trudeau"])
+        importer = PersonImporter()
+        importer.import_chunk_size = 2
+
+        result = importer.import_data(dataset)
+
+        self.assertFalse(result.valid)
+        self.assertEqual(result.errors[0]["row_number"], 4)
+        # The first chunk is rolled back with the rest of the import
+        self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+
+    def test_import_file__stream_chunks_invalid_row(self):
+        importer = PersonImporter()
+        importer.stream_files = True
+        importer.import_chunk_size = 1
+        file = BytesIO(b"id,first_name,last_name\n,Jean,Chretien\n,Paul,Martin,x\n")
+
+        with mock.patch.object(files, "sample_size", 30):
+            result = importer.import_file(file)
+
+        self.assertFalse(result.valid)
+        self.assertTrue(result.error)
+        self.assertFalse(Person.objects.filter(first_name="Jean").exists())
+
+    def test_can_validate_rows_in_parallel(self):
+        importer = ParallelPersonImporter()
+        context = importer.get_import_serializer_context()
+
+        self.assertTrue(
+            importer.can_validate_rows_in_parallel(ParallelPersonSerializer, context)
+        )
+        self.assertFalse(
+            importer.can_validate_rows_in_parallel(PersonSerializer, context)
+        )
+        self.assertFalse(
+            importer.can_validate_rows_in_parallel(
+                UniqueParallelPersonSerializer, context
+            )
+        )
+        importer.validation_workers = None
+        self.assertFalse(
+            importer.can_validate_rows_in_parallel(ParallelPersonSerializer, context)
+        )
+
+    def test_import_data__parallel_validation_of_unique_rows(self):
+        dataset = Dataset(headers=["id", "first_name", "last_name"])
+        dataset.append(["", "Jean", "Chretien"])
+        dataset.append(["", "Jean", "Charest"])
+
+        result = UniqueParallelPersonImporter().import_data(dataset, commit=False)
+
+        self.assertEqual([row.status for row in result.rows], [RowStatus.new, None])
+        self.assertEqual(result.errors[0]["row_number"], 3)
+        self.assertEqual(result.errors[0]["attribute"], "first_name")
+
+    def test_import_data__parallel_validation_after_writes(self):
+        class ParallelBookSerializer(BookSerializer):
+            validated_in_threads = set()
+
+            class Meta(BookSerializer.Meta):
+                parallel_validation = True
+
+            def validate_name(self, value):
+                self.validated_in_threads.add(threading.get_ident())
+                return value
+
+        class ParallelBookImporter(BookImporter):
+            serializer_class = ParallelBookSerializer
+            validation_workers = 2
+
+        class ParallelMultiImporter(MultiImporter):
+            importers = [ParallelBookImporter, PersonImporter]
+
+        people = Dataset(headers=["id", "first_name", "last_name"])
+        people.append([str(self.justin.pk), "Justine", "Trudeau"])
+        books = Dataset(headers=["id", "name", "author"])
+        books.append(["", "Common Ground", "Justine"])
+        books.append(["", "Memoirs", "Pierre"])
+
+        result = ParallelMultiImporter().import_data(
+            {"person": [("people.csv", people)], "book": [("books.csv", books)]},
+            commit=False,
+        )
+
+        # Threads would not see the update of the person importer
+        self.assertTrue(result.valid, result.errors)
+        self.assertEqual(
+            ParallelBookSerializer.validated_in_threads, {threading.get_ident()}
+        )
+
+    def test_get_bulk_writer__falls_back_for_many_related_fields(self):
+        importer = BookImporter()
+        importer.bulk_save = True
+
+        self.assertIsNone(importer.get_bulk_writer(BookSerializer, {}))
+        self.assertIsNotNone(BulkPersonImporter().get_bulk_writer(PersonSerializer, {}))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        Person.objects.create(first_name="Justin", last_name="Trudeau")
+        Person.objects.create(first_name="Pierre", last_name="Trudeau")
+
+    def test_export__stream(self):
+        importer = PersonImporter()
+        importer.export_chunk_size = 1
+
+        result = importer.export(stream=True)
+
+        for file_format in (formats.csv, formats.json, formats.yaml, formats.ndjson):
+            expected = PersonImporter().export().get_file(file_format).getvalue()
+            self.assertEqual(
+                b"".join(result.iter_file(file_format)), expected, file_format.key
+            )
+
+        # Spreadsheets include their creation time, so their rows are compared
+        contents = BytesIO(b"".join(result.iter_file(formats.xlsx)))
+        self.assertEqual(
+            list(files.read([formats.xlsx], contents)),
+            list(PersonImporter().export().get_dataset(formats.xlsx)),
+        )
+
+    def test_export__empty_example_row(self):
+        result = PersonImporter().export(empty=True)
+
+        # Each file gets a single example row
+        result.get_file("json")
+        self.assertEqual(len(result.get_dataset("json")), 1)
+        self.assertEqual(len(result.dataset), 0)
+
+    def test_export__stream_empty(self):
+        result = PersonImporter().export(empty=True, stream=True)
+        expected = PersonImporter().export(empty=True)
+
+        for file_format in (formats.csv, formats.json, formats.yaml):
+            self.assertEqual(
+                b"".join(result.iter_file(file_format)),
+                expected.get_file(file_format).getvalue(),
+                file_format.key,
+            )
+
+    def test_export__stream_queries_lazily(self):
+        with self.assertNumQueries(0):
+            result = PersonImporter().export(stream=True)
+
+        # The dataset is queried again each time it is iterated
+        with self.assertNumQueries(1):
+            self.assertEqual(len(result.get_dataset("csv")), 2)
+
+    def test_get_streaming_http_response(self):
+        result = PersonImporter().export(stream=True)
+
+        response = result.get_streaming_http_response("csv", filename="people")
+
+        self.assertEqual(response["Content-Type"], "application/csv")
+        self.assertEqual(
+            response["Content-Disposition"], "attachment; filename=people.csv"
+        )
+        self.assertEqual(
+            b"".join(response.streaming_content),
+            PersonImporter().export().get_file("csv").getvalue(),
+        )
+
+
+class MultiExportTests(TestCase):
+    def setUp(self):
+        author = Person.objects.create(first_name="Justin", last_name="Trudeau")
+        Person.objects.create(first_name="Pierre", last_name="Trudeau")
+        Book.objects.create(name="Common Ground", author=author)
+
+    def read_zip_file(self, contents):
+        with zipfile.ZipFile(BytesIO(contents)) as zf:
+            return {name: zf.read(name) for name in zf.namelist()}
+
+    def test_iter_file(self):
+        multi_importer = LibraryMultiImporter()
+        result = multi_importer.export(stream=True)
+        expected = multi_importer.export()
+
+        for export_mode in (ExportMode.GROUPED, ExportMode.ITEMIZED):
+            for file_format in ("csv", "json", "yaml"):
+                contents = b"".join(result.iter_file(file_format, export_mode))
+                expected_file = expected.get_file(file_format, export_mode)
+                self.assertEqual(
+                    self.read_zip_file(contents),
+                    self.read_zip_file(expected_file.getvalue()),
+                    (export_mode, file_format),
+                )
+
+    def test_iter_file__itemized_names(self):
+        result = LibraryMultiImporter().export(stream=True)
+
+        contents = b"".join(result.iter_file("json", ExportMode.ITEMIZED))
+
+        self.assertEqual(
+            sorted(self.read_zip_file(contents)),
+            sorted(
+                [
+                    "book/{0}.json".format(pk)
+                    for pk in Book.objects.values_list("pk", flat=True)
+                ]
+                + [
+                    "person/{0}.json".format(pk)
+                    for pk in Person.objects.values_list("pk", flat=True)
+                ]
+            ),
+        )
+
+    def test_get_file__itemized(self):
+        result = LibraryMultiImporter().export()
+        person = Person.objects.get(first_name="Pierre")
+
+        for file_format in (formats.csv, formats.json, formats.yaml):
+            contents = result.get_file(file_format, ExportMode.ITEMIZED).getvalue()
+
+            dataset = Dataset(headers=["id", "first_name", "last_name"])
+            dataset.append([str(person.pk), "Pierre", "Trudeau"])
+            file_name = "person/{0}.{1}".format(person.pk, file_format.extension)
+            self.assertEqual(
+                self.read_zip_file(contents)[file_name],
+                file_format.write(dataset).getvalue(),
+                file_format.key,
+            )
+
+    def test_get_file__itemized_workers(self):
+        multi_importer = LibraryMultiImporter()
+        expected = multi_importer.export()
+
+        multi_importer.export_workers = 2
+        result = multi_importer.export(stream=True)
+        result.encode_chunk_size = 2
+
+        for file_format in ("csv", "yaml"):
+            self.assertEqual(
+                self.read_zip_file(
+                    result.get_file(file_format, ExportMode.ITEMIZED).getvalue()
+                ),
+                self.read_zip_file(
+                    expected.get_file(file_format, ExportMode.ITEMIZED).getvalue()
+                ),
+            )
+            self.assertEqual(
+                self.read_zip_file(
+                    b"".join(result.iter_file(file_format, ExportMode.ITEMIZED))
+                ),
+                self.read_zip_file(
+                    expected.get_file(file_format, ExportMode.ITEMIZED).getvalue()
+                ),
+            )
+
+    def test_get_file__itemized_without_id_column(self):
+        class ChapterMultiImporter(MultiImporter):
+            importers = [ChapterImporter]
+
+        for stream in (False, True):
+            result = ChapterMultiImporter().export(stream=stream)
+
+            contents = result.get_file("csv", ExportMode.ITEMIZED).getvalue()
+
+            self.assertEqual(self.read_zip_file(contents), {}, stream)
+
+        contents = b"".join(result.iter_file("csv", ExportMode.ITEMIZED))
+        self.assertEqual(self.read_zip_file(contents), {})
+
+    def test_iter_file__uses_data_descriptors(self):
+        result = LibraryMultiImporter().export(stream=True)
+
+        contents = b"".join(result.iter_file("csv"))
+
+        with zipfile.ZipFile(BytesIO(contents)) as zf:
+            for info in zf.infolist():
+                self.assertTrue(info.flag_bits & 0x08, info.filename)
+
+    def test_iter_file__uses_zip64(self):
+        result = LibraryMultiImporter().export(stream=True)
+
+        for export_mode in (ExportMode.GROUPED, ExportMode.ITEMIZED):
+            contents = b"".join(result.iter_file("csv", export_mode))
+
+            # Entries of unknown size need ZIP64 headers to exceed 2 GiB
+            with zipfile.ZipFile(BytesIO(contents)) as zf:
+                for info in zf.infolist():
+                    self.assertGreaterEqual(info.extract_version, 45, info.filename)
+
+    def test_iter_file__single_grouped_result(self):
+        result = LibraryMultiImporter().export(keys=["person"], stream=True)
+
+        self.assertEqual(
+            b"".join(result.iter_file("csv")),
+            PersonImporter().export().get_file("csv").getvalue(),
+        )
+
+    def test_get_streaming_http_response(self):
+        result = LibraryMultiImporter().export(stream=True)
+
+        response = result.get_streaming_http_response(
+            "csv", filename="library", export_mode=ExportMode.ITEMIZED
+        )
+
+        self.assertEqual(response["Content-Type"], "application-x-zip-compressed")
+        self.assertEqual(
+            response["Content-Disposition"], "attachment; filename=library.zip"
+        )
+        self.assertEqual(
+            len(self.read_zip_file(b"".join(response.streaming_content))), 3
+        )
+
+
+class ImportFilesTests(TestCase):
+    def setUp(self):
+        Person.objects.create(first_name="Justin", last_name="Trudeau")
+
+    def get_files(self):
+        return {
+            "people.csv": SimpleUploadedFile(
+                "people.csv", b"id,first_name,last_name\n,Jean,Chretien\n", "text/csv"
+            ),
+            "invalid.csv": SimpleUploadedFile("invalid.csv", b"a,b\n1,2\n", "text/csv"),
+            "people.json": SimpleUploadedFile(
+                "people.json",
+                b'[{"id": "", "first_name": "Paul", "last_name": "Martin"}]',
+                "application/json",
+            ),
+            "image.png": SimpleUploadedFile("image.png", b"\x89PNG", "image/png"),
+        }
+
+    def assertImportFiles(self, multi_importer):
+        results = multi_importer.import_files(self.get_files())
+
+        self.assertEqual(list(results.errors), ["invalid.csv", "image.png"])
+
+        files = self.get_files()
+        del files["invalid.csv"], files["image.png"]
+        results = multi_importer.import_files(files)
+
+        self.assertTrue(results.valid)
+        self.assertEqual(
+            [file["filename"] for file in results.files], ["people.csv", "people.json"]
+        )
+        self.assertTrue(Person.objects.filter(first_name="Jean").exists())
+        self.assertTrue(Person.objects.filter(first_name="Paul").exists())
+
+    def test_import_files(self):
+        self.assertImportFiles(LibraryMultiImporter())
+
+    def test_import_files__thread_pool(self):
+        multi_importer = LibraryMultiImporter()
+        multi_importer.parse_workers = 2
+
+        self.assertImportFiles(multi_importer)
+
+    def test_import_files__process_pool(self):
+        multi_importer = LibraryMultiImporter()
+        multi_importer.parse_workers = 2
+        multi_importer.parse_executor_class = ProcessPoolExecutor
+
+        self.assertImportFiles(multi_importer)
@@ -103,3 +103,19 @@ class JSONFormatTest(TestCase):
         )
 
         self.assertEqual(result, expected)
+
+    def test_write_stream(self):
+        dataset = Dataset(headers=["name", "notes"])
+        dataset.append(["John", "Jos\u00e9"])
+        dataset.append(["Jane", "Line\nbreak"])
+
+        result = b"".join(json.write_stream(dataset.headers, iter(dataset)))
+
+        self.assertEqual(result, json.write(dataset).getvalue())
+
+    def test_write_stream__empty(self):
+        dataset = Dataset(headers=["name"])
+
+        result = b"".join(json.write_stream(dataset.headers, iter(dataset)))
+
+        self.assertEqual(result, json.write(dataset).getvalue())
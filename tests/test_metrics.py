@@ -0,0 +1,211 @@
+from django.test import TestCase
+from rest_framework import serializers
+from tablib import Dataset
+
+from multi_import.metrics import ImportMetrics, QueryCounter, QueryLog, normalize_sql
+from tests.models import Book, Chapter, Person
+from tests.test_importer import (
+    BookImporter,
+    LibraryMultiImporter,
+    PersonImporter,
+    PersonSerializer,
+    ResolvedBookImporter,
+)
+
+
+class QueryingPersonSerializer(PersonSerializer):
+    class Meta(PersonSerializer.Meta):
+        parallel_validation = True
+
+    def validate_first_name(self, value):
+        if Chapter.objects.filter(name=value).exists():
+            raise serializers.ValidationError("Invalid first name.")
+        return value
+
+
+class QueryingPersonImporter(PersonImporter):
+    serializer_class = QueryingPersonSerializer
+    collect_metrics = True
+
+
+class ImportMetricsTests(TestCase):
+    def test_phase(self):
+        counter = QueryCounter()
+        metrics = ImportMetrics(counter)
+
+        with counter.install():
+            for _index in range(2):
+                with metrics.phase("load_instances"):
+                    list(Person.objects.all())
+            with metrics.phase("process_rows", 0):
+                pass
+
+        self.assertEqual(
+            [(phase.phase, phase.step, phase.queries) for phase in metrics.phases],
+            [("load_instances", None, 2), ("process_rows", 0, 0)],
+        )
+        self.assertEqual(metrics.queries, 2)
+        self.assertEqual(metrics.to_json()["queries"], 2)
+
+    def test_query_counter__only_counts_while_installed(self):
+        counter = QueryCounter()
+        with counter.install():
+            list(Person.objects.all())
+        list(Person.objects.all())
+
+        self.assertEqual(counter.count, 1)
+
+
+class QueryLogTests(TestCase):
+    def setUp(self):
+        self.author = Person.objects.create(first_name="Justin", last_name="Trudeau")
+        chapter = Chapter.objects.create(name="One")
+        for index in range(4):
+            book = Book.objects.create(
+                name="Book {0}".format(index), author=self.author
+            )
+            book.chapters.add(chapter)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql(
+                "SELECT  *\nFROM t WHERE id IN (%s, %s, %s) AND name = 'it''s' AND n > 10"
+            ),
+            "SELECT * FROM t WHERE id IN (...) AND name = %s AND n > %s",
+        )
+
+    def test_repeated(self):
+        log = QueryLog()
+        with log.install():
+            for book in Book.objects.all():
+                book.author
+
+        repeated = log.repeated(threshold=3)
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0].count, 4)
+        self.assertIn('FROM "tests_person"', repeated[0].sql)
+        self.assertEqual(
+            repeated[0].call_site, "tests.test_metrics.QueryLogTests.test_repeated"
+        )
+        self.assertEqual(log.repeated(threshold=4), [])
+
+        with self.assertRaises(AssertionError) as cm:
+            log.assert_no_repeats(3)
+        self.assertIn("4 queries from tests.test_metrics", str(cm.exception))
+
+    def test_assert_budget(self):
+        log = QueryLog()
+        with log.install():
+            list(Book.objects.all())
+            list(Book.objects.all())
+
+        log.assert_budget(rows=4, queries_per_row=0, fixed=2)
+        with self.assertRaises(AssertionError):
+            log.assert_budget(rows=4, queries_per_row=0, fixed=1)
+
+    def test_export__does_not_query_per_row(self):
+        log = QueryLog()
+        with log.install():
+            BookImporter().export().get_file("csv")
+
+        log.assert_no_repeats(1)
+        log.assert_budget(rows=4, queries_per_row=0, fixed=3)
+
+    def test_import_data__lookups_are_cached(self):
+        dataset = Dataset(headers=["id", "name", "author", "chapters"])
+        for book in Book.objects.all():
+            dataset.append([book.pk, book.name + " 2", "Justin", "One"])
+
+        log = QueryLog()
+        with log.install():
+            result = ResolvedBookImporter().import_data(dataset)
+
+        self.assertEqual(result.errors, [])
+        self.assertFalse(
+            [
+                query
+                for query in log.repeated(threshold=1)
+                if query.call_site.endswith("search_database")
+            ]
+        )
+
+
+class ImporterMetricsTests(TestCase):
+    def setUp(self):
+        Person.objects.create(first_name="Justin", last_name="Trudeau")
+        self.people = Dataset(headers=["id", "first_name", "last_name"])
+        self.people.append(["", "Jean", "Chretien"])
+        self.people.append(["", "Paul", "Martin"])
+
+    def test_import_data__disabled(self):
+        result = PersonImporter().import_data(self.people)
+
+        self.assertIsNone(result.metrics)
+
+    def test_import_data(self):
+        importer = PersonImporter()
+        importer.collect_metrics = True
+
+        result = importer.import_data(self.people)
+
+        self.assertEqual(
+            [(phase.phase, phase.step) for phase in result.metrics.phases],
+            [
+                ("read_rows", None),
+                ("load_instances", None),
+                ("process_rows", 0),
+                ("validate_rows_post_save", None),
+                ("process_diffs", None),
+            ],
+        )
+        phases = {phase.phase: phase for phase in result.metrics.phases}
+        self.assertEqual(phases["read_rows"].queries, 0)
+        self.assertGreater(phases["load_instances"].queries, 0)
+        self.assertGreater(phases["process_rows"].queries, 0)
+        self.assertTrue(all(phase.time >= 0 for phase in result.metrics.phases))
+
+    def test_import_data__parallel_validation(self):
+        def get_queries(validation_workers):
+            importer = QueryingPersonImporter()
+            importer.validation_workers = validation_workers
+            result = importer.import_data(self.people, commit=False)
+            phases = {phase.phase: phase for phase in result.metrics.phases}
+            return phases["process_rows"].queries
+
+        # Queries of the validation threads are counted
+        self.assertEqual(get_queries(2), get_queries(None))
+
+    def test_import_data__chunks(self):
+        importer = PersonImporter()
+        importer.collect_metrics = True
+        importer.import_chunk_size = 1
+
+        result = importer.import_data(self.people)
+
+        phases = {(phase.phase, phase.step): phase for phase in result.metrics.phases}
+        self.assertEqual(len(phases), 5)
+        self.assertGreaterEqual(phases[("process_rows", 0)].queries, 2)
+
+    def test_multi_importer(self):
+        multi_importer = LibraryMultiImporter()
+        multi_importer.collect_metrics = True
+
+        results = multi_importer.import_data({"person": [("people.csv", self.people)]})
+
+        self.assertEqual(list(results.metrics.importers), ["person"])
+        person_metrics = results.metrics.importers["person"]
+        self.assertIs(results.files[0]["result"].metrics, person_metrics)
+        self.assertGreaterEqual(results.metrics.queries, person_metrics.queries)
+        self.assertGreaterEqual(results.metrics.time, person_metrics.time)
+        self.assertEqual(
+            results.metrics.to_json()["importers"]["person"]["queries"],
+            person_metrics.queries,
+        )
+
+    def test_multi_importer__disabled(self):
+        results = LibraryMultiImporter().import_data(
+            {"person": [("people.csv", self.people)]}
+        )
+
+        self.assertIsNone(results.metrics)
+        self.assertIsNone(results.files[0]["result"].metrics)
@@ -0,0 +1,48 @@
+from io import BytesIO
+
+from django.test import TestCase
+from tablib import Dataset
+
+from multi_import.exceptions import InvalidFileError
+from multi_import.formats import all_formats, ndjson
+from multi_import.helpers.files import read as multi_import_read
+
+
+class NDJSONFormatTest(TestCase):
+    def test_read_valid_file(self):
+        file = BytesIO(
+            b'{"name": "John", "age": "30"}\n\n{"name": "Jane", "age": "25"}\n'
+        )
+
+        output = multi_import_read(all_formats, file)
+
+        self.assertEqual(output.headers, ["name", "age"])
+        self.assertEqual(list(output), [("John", "30"), ("Jane", "25")])
+
+    def test_read_invalid_files(self):
+        invalid_files = [
+            "tests/fixtures/test_file.json",
+            "tests/fixtures/test_file.yaml",
+            "tests/fixtures/test_file.csv",
+        ]
+
+        for invalid_file in invalid_files:
+            with open(invalid_file, "rb") as file, self.assertRaises(InvalidFileError):
+                multi_import_read([ndjson], file)
+
+    def test_extension_property(self):
+        self.assertEqual(ndjson.extension, "ndjson")
+        self.assertEqual(ndjson.extensions, ("ndjson", "jsonl"))
+
+    def test_write_stream(self):
+        dataset = Dataset(headers=["name", "notes"])
+        dataset.append(["John", "Jos\u00e9"])
+        dataset.append(["Jane", "Line\nbreak"])
+
+        result = b"".join(ndjson.write_stream(dataset.headers, iter(dataset)))
+
+        self.assertEqual(result, ndjson.write(dataset).getvalue())
+        self.assertEqual(
+            result.decode("utf-8").splitlines()[1],
+            '{"name": "Jane", "notes": "Line\\nbreak"}',
+        )
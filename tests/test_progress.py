@@ -0,0 +1,118 @@
+from django.test import TestCase
+from tablib import Dataset
+
+from multi_import.progress import PHASE_END, PHASE_START, ROWS, ImportProgress
+from tests.models import Person
+from tests.test_importer import BulkMultiImporter, PersonImporter
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class ImportProgressTests(TestCase):
+    def setUp(self):
+        self.events = []
+        self.progress = ImportProgress(self.events.append, "person", interval=1.0)
+        self.progress.clock = self.clock = FakeClock()
+
+    def test_track(self):
+        rows = []
+        for row in self.progress.track(range(4), "process_rows", step=0, total=4):
+            rows.append(row)
+            self.clock.now += 0.6
+
+        self.assertEqual(rows, [0, 1, 2, 3])
+        self.assertEqual(
+            [(event.event, event.rows) for event in self.events],
+            [(PHASE_START, 0), (ROWS, 2), (ROWS, 4), (PHASE_END, 4)],
+        )
+        end = self.events[-1]
+        self.assertEqual(end.key, "person")
+        self.assertEqual((end.phase, end.step, end.total), ("process_rows", 0, 4))
+        self.assertAlmostEqual(end.elapsed, 2.4)
+        self.assertAlmostEqual(end.rows_per_second, 4 / 2.4)
+
+    def test_start_and_end(self):
+        phase = self.progress.start("read_rows")
+        phase.advance(10)
+        self.progress.end(phase)
+
+        self.assertEqual(
+            [(event.event, event.rows, event.rows_per_second) for event in self.events],
+            [(PHASE_START, 0, None), (PHASE_END, 10, None)],
+        )
+
+
+class ImporterProgressTests(TestCase):
+    def setUp(self):
+        Person.objects.create(first_name="Justin", last_name="Trudeau")
+        self.people = Dataset(headers=["id", "first_name", "last_name"])
+        self.people.append(["", "Jean", "Chretien"])
+        self.people.append(["", "Paul", "Martin"])
+
+    def test_import_data(self):
+        events = []
+        importer = PersonImporter()
+        importer.progress_callback = events.append
+
+        importer.import_data(self.people)
+
+        self.assertEqual(
+            [
+                (event.event, event.phase, event.step, event.rows)
+                for event in events
+                if event.event != ROWS
+            ],
+            [
+                (PHASE_START, "read_rows", None, 0),
+                (PHASE_END, "read_rows", None, 2),
+                (PHASE_START, "load_instances", None, 0),
+                (PHASE_END, "load_instances", None, 2),
+                (PHASE_START, "process_rows", 0, 0),
+                (PHASE_END, "process_rows", 0, 2),
+                (PHASE_START, "validate_rows_post_save", None, 0),
+                (PHASE_END, "validate_rows_post_save", None, 2),
+                (PHASE_START, "process_diffs", None, 0),
+                (PHASE_END, "process_diffs", None, 2),
+            ],
+        )
+        self.assertTrue(all(event.total == 2 for event in events[2:]))
+
+    def test_import_data__chunks(self):
+        events = []
+        importer = PersonImporter()
+        importer.progress_callback = events.append
+        importer.import_chunk_size = 1
+
+        importer.import_data(self.people)
+
+        self.assertEqual(
+            [event.rows for event in events if event.phase == "import_chunks"],
+            [0, 2],
+        )
+        self.assertEqual(
+            len([event for event in events if event.phase == "process_rows"]), 4
+        )
+
+    def test_multi_importer(self):
+        events = []
+        multi_importer = BulkMultiImporter()
+        multi_importer.progress_callback = events.append
+
+        multi_importer.import_data({"person": [("people.csv", self.people)]})
+
+        self.assertEqual(
+            {(event.key, event.phase) for event in events if event.event == PHASE_END},
+            {
+                ("person", "read_rows"),
+                ("person", "load_instances"),
+                ("person", "process_rows"),
+                ("person", "validate_rows_post_save"),
+                ("person", "process_diffs"),
+            },
+        )
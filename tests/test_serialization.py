@@ -0,0 +1,130 @@
+import json
+from io import BytesIO
+
+from django.test import TestCase
+from tablib import Dataset
+
+from multi_import import serialization
+from multi_import.data import ImportResult, MultiImportResult, RowStatus
+from tests.models import Chapter, Person
+from tests.test_importer import LibraryMultiImporter, PersonImporter
+
+
+class SlowFile(object):
+    """
+    A file that returns a few bytes per read.
+    """
+
+    def __init__(self, data, size=7):
+        self.file = BytesIO(data)
+        self.size = size
+
+    def read(self, size=-1):
+        return self.file.read(min(size, self.size))
+
+
+class SerializationTests(TestCase):
+    def setUp(self):
+        self.pierre = Person.objects.create(first_name="Pierre", last_name="Trudeau")
+        self.justin = Person.objects.create(first_name="Justin", last_name="Trudeau")
+        Chapter.objects.create(name="Introduction")
+
+        people = Dataset(headers=["id", "first_name", "last_name"])
+        people.append([self.pierre.pk, "Pierre", "Elliott Trudeau"])
+        people.append([self.justin.pk, "Justin", "Trudeau"])
+        people.append(["", "Jean", "Chretien"])
+        books = Dataset(headers=["id", "name", "author", "chapters"])
+        books.append(["", "Memoirs", "Pierre", "Introduction"])
+        books.append(["", "Unknown", "Nobody", ""])
+
+        self.results = LibraryMultiImporter().import_data(
+            {"person": [("people.csv", people)], "book": [("books.csv", books)]},
+            commit=False,
+        )
+        self.results.add_error("image.png", "Unsupported file.")
+
+    def assertRoundTrip(self, results, **kwargs):
+        data = serialization.dumps(results, **kwargs)
+        loaded = serialization.loads(data)
+
+        self.assertEqual(json.loads(json.dumps(loaded.to_json())), results.to_json())
+        return loaded
+
+    def test_round_trip(self):
+        loaded = self.assertRoundTrip(self.results)
+
+        self.assertEqual(
+            [file["filename"] for file in loaded.files], ["people.csv", "books.csv"]
+        )
+        self.assertEqual(list(loaded.errors), ["books.csv", "image.png"])
+        self.assertEqual(loaded.num_changes(), self.results.num_changes())
+        people = loaded.files[0]["result"]
+        self.assertEqual(
+            people.rows[0].diff["last_name"], ["Trudeau", "Elliott Trudeau"]
+        )
+        self.assertIs(people.rows[0].data.columns, people.rows[2].data.columns)
+
+    def test_round_trip__uncompressed_chunks(self):
+        self.assertRoundTrip(self.results, compress=False, chunk_size=1)
+
+    def test_round_trip__rows_from_json(self):
+        results = MultiImportResult.from_json(self.results.to_json())
+        results.files[0]["result"].rows[0].data = {"first_name": "Pierre"}
+
+        self.assertRoundTrip(results)
+
+    def test_round_trip__import_result(self):
+        people = Dataset(headers=["id", "first_name", "last_name"])
+        people.append(["", "Kim", "Campbell"])
+        result = PersonImporter().import_data(people, commit=False)
+
+        loaded = self.assertRoundTrip(result)
+
+        self.assertIsInstance(loaded, ImportResult)
+        self.assertEqual(len(loaded.new_rows), 1)
+
+        loaded = serialization.loads(
+            serialization.dumps(ImportResult("person", error="Invalid file."))
+        )
+        self.assertEqual(loaded.error, "Invalid file.")
+        self.assertEqual(loaded.rows, [])
+
+    def test_omit_unchanged(self):
+        loaded = serialization.loads(
+            serialization.dumps(self.results, omit_unchanged=True)
+        )
+
+        rows = loaded.files[0]["result"].rows
+        self.assertEqual(rows[1].status, RowStatus.unchanged)
+        self.assertEqual(rows[1].data, {})
+        self.assertEqual(rows[2].data["first_name"], "Jean")
+        self.assertLess(
+            len(serialization.dumps(self.results, omit_unchanged=True)),
+            len(serialization.dumps(self.results)),
+        )
+
+    def test_is_smaller_than_json(self):
+        self.assertLess(
+            len(serialization.dumps(self.results, compress=False)),
+            len(json.dumps(self.results.to_json())),
+        )
+
+    def test_streaming(self):
+        file = BytesIO()
+        serialization.dump(self.results, file, chunk_size=2)
+
+        loaded = serialization.load(SlowFile(file.getvalue()))
+
+        self.assertEqual(
+            loaded.to_json(), serialization.loads(file.getvalue()).to_json()
+        )
+
+    def test_invalid_data(self):
+        data = serialization.dumps(self.results)
+
+        with self.assertRaisesMessage(ValueError, "Not an import result."):
+            serialization.loads(b"JSON" + data[4:])
+        with self.assertRaisesMessage(ValueError, "Unsupported version 2."):
+            serialization.loads(data[:4] + b"\x02" + data[5:])
+        with self.assertRaisesMessage(ValueError, "Truncated data."):
+            serialization.loads(data[:-10])
@@ -1,9 +1,13 @@
+from io import BytesIO
+
 from django.test import TestCase
+from openpyxl import Workbook
 
 from multi_import.exceptions import InvalidFileError
-from multi_import.formats import xlsx
+from multi_import.formats import XlsxStream, all_formats, xlsx
 from multi_import.helpers.files import decode_contents
 from multi_import.helpers.files import read as multi_import_read
+from multi_import.importer import DataReader
 
 
 class XLSXFormatTest(TestCase):
@@ -73,3 +77,38 @@ class XLSXFormatTest(TestCase):
         for invalid_file in invalid_files:
             with open(invalid_file, "rb") as file, self.assertRaises(InvalidFileError):
                 multi_import_read([xlsx], file)
+
+    def test_stream_valid_file(self):
+        with open("tests/fixtures/test_file.xlsx", "rb") as file:
+            dataset = multi_import_read([xlsx], file)
+            stream = multi_import_read(all_formats, file, stream=True)
+
+            self.assertIsInstance(stream, XlsxStream)
+            self.assertEqual(stream.headers, dataset.headers)
+            self.assertEqual(list(stream), list(dataset))
+
+            streamed_rows = DataReader([]).read(stream)
+            dataset_rows = DataReader([]).read(dataset)
+
+        self.assertEqual(
+            [(row.row_number, row.line_number, row.data) for row, _ in streamed_rows],
+            [(row.row_number, row.line_number, row.data) for row, _ in dataset_rows],
+        )
+
+    def test_stream_normalizes_floats(self):
+        workbook = Workbook()
+        workbook.active.append(["id", "price"])
+        workbook.active.append([1.0, 2.5])
+        workbook.active.append([2.0])
+        file = BytesIO()
+        workbook.save(file)
+
+        stream = xlsx.stream(file, None)
+
+        self.assertEqual(list(stream), [(1, 2.5), (2, None)])
+
+    def test_stream_invalid_file(self):
+        file = BytesIO(b"PK\x03\x04 not a workbook")
+
+        with self.assertRaises(InvalidFileError):
+            multi_import_read(all_formats, file, stream=True)
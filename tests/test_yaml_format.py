@@ -150,3 +150,19 @@ class YAMLFormatTest(TestCase):
             )
 
         self.assertEqual(result, expected)
+
+    def test_write_stream(self):
+        dataset = Dataset(headers=["name", "notes"])
+        dataset.append(["John", "Jos\u00e9"])
+        dataset.append(["Jane", "Line\nbreak"])
+
+        result = b"".join(yaml.write_stream(dataset.headers, iter(dataset)))
+
+        self.assertEqual(result, yaml.write(dataset).getvalue())
+
+    def test_write_stream__empty(self):
+        dataset = Dataset(headers=["name"])
+
+        result = b"".join(yaml.write_stream(dataset.headers, iter(dataset)))
+
+        self.assertEqual(result, yaml.write(dataset).getvalue())